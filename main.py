@@ -6,8 +6,50 @@ Run this script to execute the complete data analysis pipeline.
 import os
 import sys
 import time
+import argparse
 from datetime import datetime
 
+import pandas as pd
+
+# Files produced by a full pipeline run
+EXPECTED_OUTPUTS = [
+    "./cleaned_data/coverage_cleaned.parquet",
+    "./cleaned_data/incidence_cleaned.parquet",
+    "./cleaned_data/reported_cases_cleaned.parquet",
+    "./cleaned_data/vaccine_introduction_cleaned.parquet",
+    "./cleaned_data/vaccine_schedule_cleaned.parquet",
+    "./vaccination_database.db",
+    "./reports/vaccination_analysis_report.txt",
+    "./powerbi_data/coverage_summary.parquet",
+    "./powerbi_data/disease_burden_summary.parquet",
+    "./powerbi_data/vaccination_effectiveness.parquet",
+    "./powerbi_data/kpi_metrics.parquet",
+    "./powerbi_data/regional_trends.parquet",
+    "./powerbi_data/PowerBI_Setup_Guide.md"
+]
+
+def outputs_up_to_date(data_path="."):
+    """
+    Check whether a previous run's outputs are still current.
+    
+    Args:
+        data_path (str): Directory containing the input Excel files
+        
+    Returns:
+        bool: True if every expected output exists and is newer than every input file
+    """
+    from src.data_loader import DATASET_FILES
+    input_paths = [os.path.join(data_path, file_name) for file_name, _ in DATASET_FILES.values()]
+    
+    try:
+        latest_input = max(os.path.getmtime(path) for path in input_paths)
+        earliest_output = min(os.path.getmtime(path) for path in EXPECTED_OUTPUTS)
+    except OSError:
+        # A missing input or output means the pipeline has to run
+        return False
+    
+    return earliest_output > latest_input
+
 def print_banner():
     """Print project banner."""
     banner = """
@@ -25,102 +67,152 @@ def print_banner():
     print(f"Execution started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 70)
 
-def run_step(step_name, script_path, description):
-    """Run a single step of the pipeline."""
-    print(f"\n{'='*20} {step_name} {'='*20}")
-    print(f"Description: {description}")
-    print(f"Executing: {script_path}")
-    print("-" * 60)
+def _run_loader(prior_results):
+    """Load the raw datasets from the Excel files."""
+    from src.data_loader import VaccinationDataLoader
+    
+    # main() may already have started parsing the files in the background
+    loader = prior_results.get('loader') or VaccinationDataLoader(".")
+    datasets = loader.load_all_datasets()
+    info = loader.get_basic_info()
+    print(f"Loaded {len(datasets)} datasets successfully")
+    return datasets
+
+def _run_cleaner(prior_results):
+    """Clean the raw datasets and save the cleaned copies."""
+    from src.data_cleaner import VaccinationDataCleaner
+    
+    # Reuse raw data from the loading step instead of parsing the Excel files again
+    raw_datasets = prior_results.get('data_loader')
+    if raw_datasets is None:
+        from src.data_loader import VaccinationDataLoader
+        loader = VaccinationDataLoader(".")
+        raw_datasets = loader.load_all_datasets()
+    
+    # Reuse the cleaned files from a previous run if the raw data is unchanged
+    cleaner = VaccinationDataCleaner()
+    input_hash = cleaner.compute_input_hash(raw_datasets)
+    cleaned_datasets = cleaner.load_cached_cleaned_data(input_hash)
+    
+    if cleaned_datasets is None:
+        # Clean and save each dataset in one pass, while it is still hot in memory
+        cleaner.clean_all_datasets(raw_datasets, output_path="./cleaned_data")
+        cleaner.save_input_hash(input_hash)
+        cleaned_datasets = cleaner.cleaned_datasets
+    
+    # Generate quality report
+    quality_report = cleaner.get_data_quality_report()
+    print("Data cleaning completed successfully")
+    return cleaned_datasets
+
+def _run_database_setup(prior_results):
+    """Create the SQLite database from the cleaned datasets."""
+    from src.database_setup import VaccinationDatabaseManager
+    
+    # Use the cleaned datasets still in memory from the cleaning step;
+    # only read them back from disk when that step did not run
+    cleaned_datasets = prior_results.get('data_cleaner')
+    if cleaned_datasets is None:
+        cleaned_datasets = {}
+        data_dir = './cleaned_data'
+        existing = {entry.name for entry in os.scandir(data_dir)} if os.path.isdir(data_dir) else set()
+        data_files = {
+            'coverage': './cleaned_data/coverage_cleaned.parquet',
+            'incidence': './cleaned_data/incidence_cleaned.parquet',
+            'reported_cases': './cleaned_data/reported_cases_cleaned.parquet',
+            'vaccine_introduction': './cleaned_data/vaccine_introduction_cleaned.parquet',
+            'vaccine_schedule': './cleaned_data/vaccine_schedule_cleaned.parquet'
+        }
+        
+        for name, file_path in data_files.items():
+            if os.path.basename(file_path) in existing:
+                cleaned_datasets[name] = pd.read_parquet(file_path, engine='pyarrow')
+    
+    # Set up database
+    db_manager = VaccinationDatabaseManager("vaccination_database.db")
+    success = db_manager.setup_complete_database(cleaned_datasets)
+    print("Database setup completed successfully")
+    return success
+
+def _run_analysis(prior_results):
+    """Run the analysis and write the reports."""
+    from src.simple_analysis import SimpleVaccinationAnalyst
+    
+    with SimpleVaccinationAnalyst() as analyst:
+        results, report = analyst.run_analysis()
+    print("Analysis completed successfully")
+    return results
+
+def _run_powerbi_connector(prior_results):
+    """Export the Power BI datasets and setup guide."""
+    from src.powerbi_connector import PowerBIConnector
+    
+    connector = PowerBIConnector()
+    connector.export_powerbi_datasets()
+    
+    connector.save_powerbi_guide()
+    
+    print("Power BI materials generated successfully")
+    return True
+
+# Pipeline step handlers, keyed by the step's script identifier
+HANDLERS = {
+    'data_loader': _run_loader,
+    'data_cleaner': _run_cleaner,
+    'database_setup': _run_database_setup,
+    'analysis': _run_analysis,
+    'powerbi_connector': _run_powerbi_connector
+}
+
+def run_step(step_name, script_path, description, prior_results=None):
+    """
+    Run a single step of the pipeline.
+    
+    Args:
+        step_name (str): Display name of the step
+        script_path (str): Identifier of the step to run (a key of HANDLERS)
+        description (str): Short description of the step
+        prior_results (dict): Results of the steps already executed, keyed by script
+            (plus the prefetching data loader under 'loader')
+    """
+    prior_results = prior_results or {}
+    sys.stdout.write(
+        f"\n{'='*20} {step_name} {'='*20}\n"
+        f"Description: {description}\n"
+        f"Executing: {script_path}\n"
+        f"{'-' * 60}\n"
+    )
     
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     try:
-        # Import and run the module
-        if script_path == "data_loader":
-            from src.data_loader import VaccinationDataLoader
-            loader = VaccinationDataLoader(".")
-            datasets = loader.load_all_datasets()
-            info = loader.get_basic_info()
-            print(f"Loaded {len(datasets)} datasets successfully")
-            return datasets
-            
-        elif script_path == "data_cleaner":
-            from src.data_cleaner import VaccinationDataCleaner
-            from src.data_loader import VaccinationDataLoader
-            
-            # Load raw data
-            loader = VaccinationDataLoader(".")
-            raw_datasets = loader.load_all_datasets()
-            
-            # Clean data
-            cleaner = VaccinationDataCleaner()
-            cleaned_datasets = cleaner.clean_all_datasets(raw_datasets)
-            
-            # Save cleaned data
-            cleaner.save_cleaned_data()
-            
-            # Generate quality report
-            quality_report = cleaner.get_data_quality_report()
-            print("Data cleaning completed successfully")
-            return cleaned_datasets
-            
-        elif script_path == "database_setup":
-            from src.database_setup import VaccinationDatabaseManager
-            import pandas as pd
-            
-            # Load cleaned datasets
-            cleaned_datasets = {}
-            data_files = {
-                'coverage': './cleaned_data/coverage_cleaned.csv',
-                'incidence': './cleaned_data/incidence_cleaned.csv',
-                'reported_cases': './cleaned_data/reported_cases_cleaned.csv',
-                'vaccine_introduction': './cleaned_data/vaccine_introduction_cleaned.csv',
-                'vaccine_schedule': './cleaned_data/vaccine_schedule_cleaned.csv'
-            }
-            
-            for name, file_path in data_files.items():
-                if os.path.exists(file_path):
-                    cleaned_datasets[name] = pd.read_csv(file_path)
-            
-            # Set up database
-            db_manager = VaccinationDatabaseManager("vaccination_database.db")
-            success = db_manager.setup_complete_database(cleaned_datasets)
-            print("Database setup completed successfully")
-            return success
-            
-        elif script_path == "analysis":
-            from src.simple_analysis import SimpleVaccinationAnalyst
-            
-            analyst = SimpleVaccinationAnalyst()
-            results, report = analyst.run_analysis()
-            print("Analysis completed successfully")
-            return results
-            
-        elif script_path == "powerbi_connector":
-            from src.powerbi_connector import PowerBIConnector
-            
-            connector = PowerBIConnector()
-            connector.export_powerbi_datasets()
-            
-            guide = connector.generate_powerbi_guide()
-            with open("./powerbi_data/PowerBI_Setup_Guide.md", "w") as f:
-                f.write(guide)
-            
-            print("Power BI materials generated successfully")
-            return True
-            
+        return HANDLERS[script_path](prior_results)
+    
     except Exception as e:
         print(f"ERROR in {step_name}: {str(e)}")
         return None
     
     finally:
-        elapsed_time = time.time() - start_time
-        print(f"\nStep completed in {elapsed_time:.2f} seconds")
+        elapsed_time = time.perf_counter() - start_time
+        sys.stdout.write(f"\nStep completed in {elapsed_time:.2f} seconds\n")
 
-def main():
-    """Execute the complete vaccination data analysis pipeline."""
+def main(force=False, only=None, start_from=None):
+    """
+    Execute the complete vaccination data analysis pipeline.
+    
+    Args:
+        force (bool): Run every step even if the outputs are newer than the inputs
+        only (str): Run just this step (a key of HANDLERS)
+        start_from (str): Skip the steps before this one (a key of HANDLERS); skipped
+            steps' outputs are read back from disk
+    """
     print_banner()
     
+    partial_run = only is not None or start_from is not None
+    if not force and not partial_run and outputs_up_to_date():
+        print("All outputs are newer than the input files; nothing to do (use --force to rerun)")
+        return True
+    
     # Pipeline steps
     steps = [
         {
@@ -150,12 +242,26 @@ def main():
         }
     ]
     
-    # Execute pipeline
+    # Select the steps to run
+    if only is not None:
+        steps = [step for step in steps if step['script'] == only]
+    elif start_from is not None:
+        scripts = [step['script'] for step in steps]
+        steps = steps[scripts.index(start_from):]
+    
     results = {}
-    total_start_time = time.time()
+    if steps[0]['script'] == 'data_loader':
+        # Start parsing the Excel files right away; the loading step collects them
+        from src.data_loader import VaccinationDataLoader
+        loader = VaccinationDataLoader(".")
+        loader.prefetch_all_datasets()
+        results['loader'] = loader
+    
+    # Execute pipeline
+    total_start_time = time.perf_counter()
     
     for step in steps:
-        result = run_step(step['name'], step['script'], step['description'])
+        result = run_step(step['name'], step['script'], step['description'], results)
         results[step['script']] = result
         
         if result is None:
@@ -163,25 +269,26 @@ def main():
             return False
     
     # Pipeline completion summary
-    total_time = time.time() - total_start_time
-    
-    print("\n" + "="*70)
-    print("🎉 VACCINATION DATA ANALYSIS PIPELINE COMPLETED SUCCESSFULLY! 🎉")
-    print("="*70)
-    print(f"Total execution time: {total_time:.2f} seconds")
-    print(f"Completion time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    total_time = time.perf_counter() - total_start_time
     
-    # Summary of generated files
-    print("\n📂 GENERATED FILES AND OUTPUTS:")
-    print("-" * 40)
+    sys.stdout.write(
+        f"\n{'='*70}\n"
+        "🎉 VACCINATION DATA ANALYSIS PIPELINE COMPLETED SUCCESSFULLY! 🎉\n"
+        f"{'='*70}\n"
+        f"Total execution time: {total_time:.2f} seconds\n"
+        f"Completion time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+        # Summary of generated files
+        "\n📂 GENERATED FILES AND OUTPUTS:\n"
+        f"{'-' * 40}\n"
+    )
     
     generated_files = [
         "📊 Cleaned Datasets:",
-        "  • ./cleaned_data/coverage_cleaned.csv",
-        "  • ./cleaned_data/incidence_cleaned.csv", 
-        "  • ./cleaned_data/reported_cases_cleaned.csv",
-        "  • ./cleaned_data/vaccine_introduction_cleaned.csv",
-        "  • ./cleaned_data/vaccine_schedule_cleaned.csv",
+        "  • ./cleaned_data/coverage_cleaned.parquet",
+        "  • ./cleaned_data/incidence_cleaned.parquet", 
+        "  • ./cleaned_data/reported_cases_cleaned.parquet",
+        "  • ./cleaned_data/vaccine_introduction_cleaned.parquet",
+        "  • ./cleaned_data/vaccine_schedule_cleaned.parquet",
         "",
         "🗄️ SQL Database:",
         "  • ./vaccination_database.db (SQLite database)",
@@ -195,30 +302,30 @@ def main():
         "  • ./reports/antigen_coverage_simple.png",
         "",
         "💼 Power BI Materials:",
-        "  • ./powerbi_data/coverage_summary.csv",
-        "  • ./powerbi_data/disease_burden_summary.csv",
-        "  • ./powerbi_data/vaccination_effectiveness.csv",
-        "  • ./powerbi_data/kpi_metrics.csv",
-        "  • ./powerbi_data/regional_trends.csv",
+        "  • ./powerbi_data/coverage_summary.parquet",
+        "  • ./powerbi_data/disease_burden_summary.parquet",
+        "  • ./powerbi_data/vaccination_effectiveness.parquet",
+        "  • ./powerbi_data/kpi_metrics.parquet",
+        "  • ./powerbi_data/regional_trends.parquet",
         "  • ./powerbi_data/PowerBI_Setup_Guide.md",
         "",
         "📚 Documentation:",
         "  • ./README.md (Project overview and findings)"
     ]
     
-    for item in generated_files:
-        print(item)
-    
-    print("\n🎯 NEXT STEPS:")
-    print("-" * 20)
-    print("1. Review the analysis report in ./reports/vaccination_analysis_report.txt")
-    print("2. Open Power BI and import datasets from ./powerbi_data/")
-    print("3. Follow the Power BI setup guide for dashboard creation")
-    print("4. Use SQL queries in ./sql/sample_queries.sql for additional analysis")
-    print("5. Explore the comprehensive README.md for detailed project insights")
+    sys.stdout.write("\n".join(generated_files) + "\n")
     
-    print("\n🏆 PROJECT DELIVERABLES COMPLETED:")
-    print("-" * 35)
+    sys.stdout.write(
+        "\n🎯 NEXT STEPS:\n"
+        f"{'-' * 20}\n"
+        "1. Review the analysis report in ./reports/vaccination_analysis_report.txt\n"
+        "2. Open Power BI and import datasets from ./powerbi_data/\n"
+        "3. Follow the Power BI setup guide for dashboard creation\n"
+        "4. Use SQL queries in ./sql/sample_queries.sql for additional analysis\n"
+        "5. Explore the comprehensive README.md for detailed project insights\n"
+        "\n🏆 PROJECT DELIVERABLES COMPLETED:\n"
+        f"{'-' * 35}\n"
+    )
     deliverables = [
         "✅ Data extraction and cleaning scripts",
         "✅ Normalized SQL database with vaccination data",
@@ -231,16 +338,26 @@ def main():
         "✅ Technical and business documentation"
     ]
     
-    for deliverable in deliverables:
-        print(deliverable)
-    
-    print("\n" + "="*70)
-    print("Thank you for using the Vaccination Data Analysis Pipeline!")
-    print("For questions or support, refer to the documentation files.")
-    print("="*70)
+    sys.stdout.write(
+        "\n".join(deliverables) + "\n"
+        f"\n{'='*70}\n"
+        "Thank you for using the Vaccination Data Analysis Pipeline!\n"
+        "For questions or support, refer to the documentation files.\n"
+        f"{'='*70}\n"
+    )
     
     return True
 
 if __name__ == "__main__":
-    success = main()
+    parser = argparse.ArgumentParser(description="Run the vaccination data analysis pipeline")
+    parser.add_argument("--force", action="store_true",
+                        help="rerun every step even if the outputs are up to date")
+    step_group = parser.add_mutually_exclusive_group()
+    step_group.add_argument("--only", choices=list(HANDLERS),
+                            help="run only this step")
+    step_group.add_argument("--from", dest="start_from", choices=list(HANDLERS),
+                            help="resume the pipeline at this step")
+    args = parser.parse_args()
+    
+    success = main(force=args.force, only=args.only, start_from=args.start_from)
     sys.exit(0 if success else 1)
@@ -5,41 +5,176 @@ This module answers specific business questions using the vaccination database.
 
 import pandas as pd
 import sqlite3
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from src.sqlite_tuning import apply_read_pragmas
+except ImportError:
+    # Run as a script from src/
+    from sqlite_tuning import apply_read_pragmas
 import warnings
 warnings.filterwarnings('ignore')
 
+# Rows fetched from SQLite per batch when reading query results
+QUERY_CHUNK_SIZE = 50000
+
 class VaccinationAnalyst:
     """Class to perform comprehensive analysis on vaccination data."""
     
-    def __init__(self, db_path="vaccination_database.db"):
+    def __init__(self, db_path="vaccination_database.db", cache_path="./cache/queries"):
         """
         Initialize analyst with database connection.
         
         Args:
             db_path (str): Path to SQLite database
+            cache_path (str): Directory for Parquet copies of query results,
+                or None to always query the database
         """
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        self.cache_path = cache_path
+        self._query_cache = {}
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.conn = self.get_connection()
+        self._recent_coverage = None
+        self._recent_coverage_lock = threading.Lock()
         self.results = {}
+    
+    def get_connection(self):
+        """
+        Return the calling thread's database connection, opening it on first use.
+        
+        Returns:
+            sqlite3.Connection: Connection owned by the calling thread
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # check_same_thread=False only so close() can close every connection;
+            # each connection is still used by a single thread. The workload is
+            # read-only, so autocommit skips transaction bookkeeping, and a larger
+            # statement cache keeps repeated SQL texts prepared
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   isolation_level=None, cached_statements=256)
+            apply_read_pragmas(conn)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
         
     def execute_query(self, query, description=""):
-        """Execute SQL query and return results."""
+        """
+        Execute SQL query and return results.
+        
+        Results are cached in memory and, when a cache directory is set, as
+        Parquet under a key built from the query text and the database file's
+        modification time and size, so re-runs against an unchanged database
+        skip SQLite entirely.
+        """
         if description:
             print(f"Analyzing: {description}")
         
         try:
-            df = pd.read_sql_query(query, self.conn)
+            stat = os.stat(self.db_path)
+            key = hashlib.blake2b(
+                f"{os.path.abspath(self.db_path)}:{stat.st_mtime}:{stat.st_size}:{query}".encode(),
+                digest_size=16
+            ).hexdigest()
+        except OSError:
+            key = None
+        
+        if key in self._query_cache:
+            return self._query_cache[key].copy()
+        cache_file = f"{self.cache_path}/{key}.parquet" if key and self.cache_path else None
+        if cache_file and os.path.exists(cache_file):
+            df = pd.read_parquet(cache_file, engine='pyarrow')
+            self._query_cache[key] = df
+            return df.copy()
+        
+        try:
+            # Fetch in batches so the full result never sits in memory twice
+            # (once as Python row tuples and once as a DataFrame); infer_objects
+            # restores the dtypes of columns that were all NULL in some batch
+            chunks = pd.read_sql_query(query, self.get_connection(), chunksize=QUERY_CHUNK_SIZE)
+            df = pd.concat(chunks, ignore_index=True).infer_objects()
+            if key:
+                self._query_cache[key] = df.copy()
+            if cache_file:
+                try:
+                    os.makedirs(self.cache_path, exist_ok=True)
+                    df.to_parquet(cache_file, engine='pyarrow', index=False)
+                except Exception as e:
+                    print(f"Could not cache query result: {e}")
             return df
         except Exception as e:
             print(f"Error executing query: {e}")
             return pd.DataFrame()
     
+    def get_recent_coverage(self):
+        """
+        Return the coverage records since 2020, fetched once and shared.
+        
+        Easy questions Q2, Q4 and Q5 and scenario S3 all aggregate these rows,
+        so the coverage table is scanned once for all of them even when the
+        question batches run in different threads.
+        
+        Returns:
+            pd.DataFrame: Coverage records with year >= 2020
+        """
+        with self._recent_coverage_lock:
+            if self._recent_coverage is None:
+                coverage_query = """
+                SELECT 
+                    country_code,
+                    who_region,
+                    year,
+                    antigen_code,
+                    antigen_description,
+                    coverage,
+                    dose_number,
+                    vaccine_type
+                FROM mat_coverage_2020plus;
+                """
+                recent_coverage = self.execute_query(coverage_query, "Coverage records since 2020 (Q2, Q4, Q5, S3)")
+                if recent_coverage.empty:
+                    recent_coverage = pd.DataFrame(columns=['country_code', 'who_region', 'year', 'antigen_code',
+                                                            'antigen_description', 'coverage', 'dose_number',
+                                                            'vaccine_type'])
+                self._recent_coverage = recent_coverage
+        return self._recent_coverage
+    
+    @staticmethod
+    def _grouped_correlation(codes, x, y):
+        """
+        Pearson correlation of x and y within each group, without a per-group loop.
+        
+        Args:
+            codes (np.ndarray): Group number of each row (0..n_groups-1)
+            x (np.ndarray): First variable
+            y (np.ndarray): Second variable
+            
+        Returns:
+            np.ndarray: Correlation coefficient per group (NaN for constant groups)
+        """
+        counts = np.bincount(codes)
+        # Center on the group means first (two-pass) to avoid the cancellation
+        # of the single-pass sum-of-squares formula
+        dx = x - (np.bincount(codes, weights=x) / counts)[codes]
+        dy = y - (np.bincount(codes, weights=y) / counts)[codes]
+        sxy = np.bincount(codes, weights=dx * dy)
+        sxx = np.bincount(codes, weights=dx * dx)
+        syy = np.bincount(codes, weights=dy * dy)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return sxy / np.sqrt(sxx * syy)
+    
     def answer_easy_questions(self):
         """Answer easy level questions."""
         print("=" * 60)
@@ -47,94 +182,28 @@ class VaccinationAnalyst:
         print("=" * 60)
         
         # Q1: How do vaccination rates correlate with a decrease in disease incidence?
+        # Only the raw pairs come from SQLite; the per-pair correlation is
+        # computed with numpy instead of SUM/SQRT aggregates in SQL
         query1 = """
-        WITH correlation_data AS (
-            SELECT 
-                ve.antigen_code,
-                ve.disease_code,
-                ve.coverage,
-                ve.incidence_rate
-            FROM v_vaccination_effectiveness ve
-            WHERE ve.coverage IS NOT NULL 
-                AND ve.incidence_rate IS NOT NULL
-                AND ve.year >= 2010
-        )
         SELECT 
             antigen_code,
             disease_code,
-            COUNT(*) as data_points,
-            ROUND(
-                (COUNT(*) * SUM(coverage * incidence_rate) - SUM(coverage) * SUM(incidence_rate)) /
-                (SQRT(COUNT(*) * SUM(coverage * coverage) - SUM(coverage) * SUM(coverage)) *
-                 SQRT(COUNT(*) * SUM(incidence_rate * incidence_rate) - SUM(incidence_rate) * SUM(incidence_rate))), 4
-            ) as correlation_coefficient
-        FROM correlation_data
-        GROUP BY antigen_code, disease_code
-        HAVING COUNT(*) > 20
-        ORDER BY correlation_coefficient;
-        """
-        
-        q1_result = self.execute_query(query1, "Q1: Vaccination-Disease Correlation")
-        self.results['q1_correlation'] = q1_result
-        
-        # Q2: Drop-off rate between doses
-        query2 = """
-        WITH dose_analysis AS (
-            SELECT 
-                country_code,
-                country_name,
-                year,
-                antigen_code,
-                coverage,
-                CASE 
-                    WHEN antigen_code LIKE '%1' THEN '1st_dose'
-                    WHEN antigen_code LIKE '%2' THEN '2nd_dose'
-                    WHEN antigen_code LIKE '%3' THEN '3rd_dose'
-                END as dose_number,
-                SUBSTR(antigen_code, 1, 3) as vaccine_type
-            FROM v_coverage_analysis
-            WHERE (antigen_code LIKE '%1' OR antigen_code LIKE '%2' OR antigen_code LIKE '%3')
-                AND year >= 2020
-        ),
-        dose_comparison AS (
-            SELECT 
-                vaccine_type,
-                country_code,
-                year,
-                MAX(CASE WHEN dose_number = '1st_dose' THEN coverage END) as dose1_coverage,
-                MAX(CASE WHEN dose_number = '2nd_dose' THEN coverage END) as dose2_coverage,
-                MAX(CASE WHEN dose_number = '3rd_dose' THEN coverage END) as dose3_coverage
-            FROM dose_analysis
-            GROUP BY vaccine_type, country_code, year
-        )
-        SELECT 
-            vaccine_type,
-            AVG(dose1_coverage) as avg_dose1_coverage,
-            AVG(dose2_coverage) as avg_dose2_coverage,
-            AVG(dose3_coverage) as avg_dose3_coverage,
-            AVG(dose1_coverage - dose2_coverage) as avg_dropout_dose1_to_2,
-            AVG(dose2_coverage - dose3_coverage) as avg_dropout_dose2_to_3,
-            COUNT(*) as num_observations
-        FROM dose_comparison
-        WHERE dose1_coverage IS NOT NULL AND dose2_coverage IS NOT NULL
-        GROUP BY vaccine_type
-        ORDER BY avg_dropout_dose1_to_2 DESC;
+            coverage,
+            incidence_rate
+        FROM mat_vaccination_effectiveness
+        WHERE coverage IS NOT NULL 
+            AND incidence_rate IS NOT NULL
+            AND year >= 2010;
         """
         
-        q2_result = self.execute_query(query2, "Q2: Drop-off Rate Between Doses")
-        self.results['q2_dropout'] = q2_result
-        
-        # Q3: Urban vs Rural vaccination patterns (using geo_area from schedule data)
+        # Q3: Urban vs Rural vaccination patterns (using the area type derived
+        # from geo_area at database setup); SQLite's LIKE is case-insensitive,
+        # so 'female' also counts as a 'male' match
         query3 = """
         SELECT 
-            CASE 
-                WHEN UPPER(geo_area) LIKE '%URBAN%' THEN 'Urban'
-                WHEN UPPER(geo_area) LIKE '%RURAL%' THEN 'Rural'
-                WHEN UPPER(geo_area) LIKE '%NATIONAL%' THEN 'National'
-                ELSE 'Other'
-            END as area_type,
-            AVG(CASE WHEN target_population_description LIKE '%male%' THEN 1 ELSE 0 END) as male_programs,
-            AVG(CASE WHEN target_population_description LIKE '%female%' THEN 1 ELSE 0 END) as female_programs,
+            area_type,
+            AVG(CASE WHEN target_population_description LIKE '%MALE%' THEN 1 ELSE 0 END) as male_programs,
+            AVG(CASE WHEN target_population_description LIKE '%FEMALE%' THEN 1 ELSE 0 END) as female_programs,
             COUNT(*) as total_programs
         FROM fact_vaccine_schedule
         WHERE geo_area IS NOT NULL AND year >= 2020
@@ -142,49 +211,91 @@ class VaccinationAnalyst:
         ORDER BY total_programs DESC;
         """
         
-        q3_result = self.execute_query(query3, "Q3: Urban vs Rural Vaccination Patterns")
+        # The three reads are independent and sqlite3 releases the GIL while
+        # SQLite runs, so they are fetched side by side; each worker thread
+        # reads through its own connection (see get_connection)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            q1_future = executor.submit(self.execute_query, query1, "Q1: Vaccination-Disease Correlation")
+            q3_future = executor.submit(self.execute_query, query3, "Q3: Urban vs Rural Vaccination Patterns")
+            coverage_future = executor.submit(self.get_recent_coverage)
+            q1_data = q1_future.result()
+            q3_result = q3_future.result()
+            recent_coverage = coverage_future.result()
+        
+        if q1_data.empty:
+            q1_result = pd.DataFrame(columns=['antigen_code', 'disease_code', 'data_points', 'correlation_coefficient'])
+        else:
+            pairs = q1_data.groupby(['antigen_code', 'disease_code'])
+            q1_result = pairs.size().rename('data_points').reset_index()
+            q1_result['correlation_coefficient'] = self._grouped_correlation(
+                pairs.ngroup().to_numpy(), q1_data['coverage'].to_numpy(dtype=float),
+                q1_data['incidence_rate'].to_numpy(dtype=float)
+            )
+            q1_result = q1_result[q1_result['data_points'] > 20]
+            q1_result['correlation_coefficient'] = q1_result['correlation_coefficient'].round(4)
+            q1_result = q1_result.sort_values('correlation_coefficient', na_position='first').reset_index(drop=True)
+        self.results['q1_correlation'] = q1_result
+        
+        # Q2: Drop-off rate between doses
+        # (Q2, Q4 and Q5 aggregate the shared recent coverage records in pandas
+        # instead of running one query per question)
+        print("Analyzing: Q2: Drop-off Rate Between Doses")
+        dose_records = recent_coverage[recent_coverage['dose_number'].isin([1, 2, 3])]
+        dose_comparison = (
+            dose_records
+            .groupby(['vaccine_type', 'country_code', 'year', 'dose_number'])['coverage'].max()
+            .unstack('dose_number')
+            .reindex(columns=[1, 2, 3])
+        )
+        dose_comparison.columns = ['dose1_coverage', 'dose2_coverage', 'dose3_coverage']
+        dose_comparison = dose_comparison.dropna(subset=['dose1_coverage', 'dose2_coverage'])
+        dose_comparison['dropout_dose1_to_2'] = dose_comparison['dose1_coverage'] - dose_comparison['dose2_coverage']
+        dose_comparison['dropout_dose2_to_3'] = dose_comparison['dose2_coverage'] - dose_comparison['dose3_coverage']
+        
+        q2_result = (
+            dose_comparison.groupby('vaccine_type')
+            .agg(avg_dose1_coverage=('dose1_coverage', 'mean'),
+                 avg_dose2_coverage=('dose2_coverage', 'mean'),
+                 avg_dose3_coverage=('dose3_coverage', 'mean'),
+                 avg_dropout_dose1_to_2=('dropout_dose1_to_2', 'mean'),
+                 avg_dropout_dose2_to_3=('dropout_dose2_to_3', 'mean'),
+                 num_observations=('dose1_coverage', 'size'))
+            .reset_index()
+            .sort_values('avg_dropout_dose1_to_2', ascending=False)
+            .reset_index(drop=True)
+        )
+        self.results['q2_dropout'] = q2_result
+        
+        # Q3 is aggregated entirely by SQLite
         self.results['q3_urban_rural'] = q3_result
         
         # Q4: Seasonal patterns in vaccination uptake
-        query4 = """
-        WITH monthly_data AS (
-            SELECT 
-                country_code,
-                year,
-                antigen_code,
-                coverage,
-                (year % 12) + 1 as simulated_month  -- Simulating monthly data
-            FROM v_coverage_analysis
-            WHERE year >= 2020
+        print("Analyzing: Q4: Seasonal Vaccination Patterns")
+        # Simulating monthly data; group the coverage column by the month array
+        # directly rather than copying the whole frame to add a column
+        month = recent_coverage['year'].to_numpy() % 12 + 1
+        q4_result = (
+            recent_coverage['coverage']
+            .groupby(month)
+            .agg(avg_coverage='mean', data_points='size')
+            .rename_axis('month')
+            .reset_index()
         )
-        SELECT 
-            simulated_month as month,
-            AVG(coverage) as avg_coverage,
-            COUNT(*) as data_points
-        FROM monthly_data
-        GROUP BY simulated_month
-        ORDER BY simulated_month;
-        """
-        
-        q4_result = self.execute_query(query4, "Q4: Seasonal Vaccination Patterns")
         self.results['q4_seasonal'] = q4_result
         
         # Q5: Regional disparities
-        query5 = """
-        SELECT 
-            who_region,
-            AVG(coverage) as avg_coverage,
-            MIN(coverage) as min_coverage,
-            MAX(coverage) as max_coverage,
-            MAX(coverage) - MIN(coverage) as coverage_gap,
-            COUNT(DISTINCT country_code) as num_countries
-        FROM v_coverage_analysis
-        WHERE year >= 2020 AND who_region IS NOT NULL
-        GROUP BY who_region
-        ORDER BY avg_coverage DESC;
-        """
-        
-        q5_result = self.execute_query(query5, "Q5: Regional Vaccination Disparities")
+        print("Analyzing: Q5: Regional Vaccination Disparities")
+        q5_result = (
+            recent_coverage.dropna(subset=['who_region'])
+            .groupby('who_region')
+            .agg(avg_coverage=('coverage', 'mean'),
+                 min_coverage=('coverage', 'min'),
+                 max_coverage=('coverage', 'max'),
+                 num_countries=('country_code', 'nunique'))
+            .reset_index()
+        )
+        q5_result.insert(4, 'coverage_gap', q5_result['max_coverage'] - q5_result['min_coverage'])
+        q5_result = q5_result.sort_values('avg_coverage', ascending=False).reset_index(drop=True)
         self.results['q5_regional'] = q5_result
         
         return {
@@ -202,23 +313,51 @@ class VaccinationAnalyst:
         print("=" * 60)
         
         # Q1: Vaccine introduction impact on disease cases
+        # Case averages for the 3 years either side of each introduction come
+        # from one windowed pass over per-country yearly totals; introduction
+        # years are added to the yearly rows so the window is anchored even
+        # in years without reported cases
         query1 = """
-        WITH intro_impact AS (
+        WITH intro_years AS (
+            SELECT DISTINCT country_code, vaccine_description, year
+            FROM fact_vaccine_introduction
+            WHERE introduction_status = 'Yes' AND year >= 2000
+        ),
+        yearly_cases AS (
+            SELECT country_code, year, SUM(cases_sum) as cases_sum, SUM(cases_count) as cases_count
+            FROM (
+                SELECT country_code, year, SUM(cases) as cases_sum, COUNT(cases) as cases_count
+                FROM fact_reported_cases
+                GROUP BY country_code, year
+                UNION ALL
+                SELECT DISTINCT country_code, year, NULL, 0
+                FROM intro_years
+            )
+            GROUP BY country_code, year
+        ),
+        cases_windowed AS (
             SELECT 
-                fvi.country_code,
+                country_code,
+                year,
+                CAST(SUM(cases_sum) OVER before_intro AS REAL) / NULLIF(SUM(cases_count) OVER before_intro, 0) as avg_cases_before,
+                CAST(SUM(cases_sum) OVER after_intro AS REAL) / NULLIF(SUM(cases_count) OVER after_intro, 0) as avg_cases_after
+            FROM yearly_cases
+            WINDOW
+                before_intro AS (PARTITION BY country_code ORDER BY year RANGE BETWEEN 3 PRECEDING AND 1 PRECEDING),
+                after_intro AS (PARTITION BY country_code ORDER BY year RANGE BETWEEN 1 FOLLOWING AND 3 FOLLOWING)
+        ),
+        intro_impact AS (
+            SELECT 
+                iy.country_code,
                 dc.country_name,
-                fvi.vaccine_description,
-                fvi.year as intro_year,
-                AVG(CASE WHEN frc.year BETWEEN fvi.year-3 AND fvi.year-1 THEN frc.cases END) as avg_cases_before,
-                AVG(CASE WHEN frc.year BETWEEN fvi.year+1 AND fvi.year+3 THEN frc.cases END) as avg_cases_after
-            FROM fact_vaccine_introduction fvi
-            JOIN dim_countries dc ON fvi.country_code = dc.country_code
-            LEFT JOIN fact_reported_cases frc ON fvi.country_code = frc.country_code
-            WHERE fvi.introduction_status = 'Yes' 
-                AND fvi.year >= 2000
-                AND frc.year BETWEEN fvi.year-3 AND fvi.year+3
-            GROUP BY fvi.country_code, dc.country_name, fvi.vaccine_description, fvi.year
-            HAVING avg_cases_before IS NOT NULL AND avg_cases_after IS NOT NULL
+                iy.vaccine_description,
+                iy.year as intro_year,
+                cw.avg_cases_before,
+                cw.avg_cases_after
+            FROM intro_years iy
+            JOIN dim_countries dc ON iy.country_code = dc.country_code
+            JOIN cases_windowed cw ON iy.country_code = cw.country_code AND iy.year = cw.year
+            WHERE cw.avg_cases_before IS NOT NULL AND cw.avg_cases_after IS NOT NULL
         )
         SELECT 
             vaccine_description,
@@ -250,8 +389,8 @@ class VaccinationAnalyst:
                     WHEN vc.coverage >= 80 THEN 'High Coverage Period'
                     ELSE 'Low Coverage Period'
                 END as campaign_period
-            FROM v_coverage_analysis vc
-            LEFT JOIN v_disease_burden db ON vc.country_code = db.country_code 
+            FROM mat_coverage_analysis vc
+            LEFT JOIN mat_disease_burden db ON vc.country_code = db.country_code 
                 AND vc.year = db.year
             WHERE vc.year >= 2000
         )
@@ -333,44 +472,42 @@ class VaccinationAnalyst:
         
         # Scenario 1: Resource allocation for low coverage regions
         query1 = """
-        WITH resource_priority AS (
-            SELECT 
-                vc.country_code,
-                vc.country_name,
-                vc.who_region,
-                AVG(vc.coverage) as avg_coverage,
-                AVG(db.incidence_rate) as avg_incidence_rate,
-                COUNT(*) as data_points
-            FROM v_coverage_analysis vc
-            LEFT JOIN v_disease_burden db ON vc.country_code = db.country_code 
-                AND vc.year = db.year
-            WHERE vc.year >= 2020
-            GROUP BY vc.country_code, vc.country_name, vc.who_region
-            HAVING COUNT(*) >= 5
-        )
         SELECT 
-            country_name,
-            who_region,
-            ROUND(avg_coverage, 2) as avg_coverage,
-            ROUND(avg_incidence_rate, 2) as avg_incidence_rate,
-            CASE 
-                WHEN avg_coverage < 70 AND avg_incidence_rate > 20 THEN 'Critical Priority'
-                WHEN avg_coverage < 80 AND avg_incidence_rate > 10 THEN 'High Priority'
-                WHEN avg_coverage < 90 OR avg_incidence_rate > 5 THEN 'Medium Priority'
-                ELSE 'Low Priority'
-            END as resource_priority
-        FROM resource_priority
-        ORDER BY 
-            CASE 
-                WHEN avg_coverage < 70 AND avg_incidence_rate > 20 THEN 1
-                WHEN avg_coverage < 80 AND avg_incidence_rate > 10 THEN 2
-                WHEN avg_coverage < 90 OR avg_incidence_rate > 5 THEN 3
-                ELSE 4
-            END,
-            avg_coverage;
+            vc.country_name,
+            vc.who_region,
+            AVG(vc.coverage) as avg_coverage,
+            AVG(db.incidence_rate) as avg_incidence_rate
+        FROM mat_coverage_2020plus vc
+        LEFT JOIN mat_disease_burden db ON vc.country_code = db.country_code 
+            AND vc.year = db.year
+        GROUP BY vc.country_code, vc.country_name, vc.who_region
+        HAVING COUNT(*) >= 5;
         """
         
         s1_result = self.execute_query(query1, "Scenario 1: Resource Allocation Priority")
+        if s1_result.empty:
+            s1_result = pd.DataFrame(columns=['country_name', 'who_region', 'avg_coverage',
+                                              'avg_incidence_rate', 'resource_priority'])
+        else:
+            # Classify on the unrounded averages in one vectorized pass
+            coverage = s1_result['avg_coverage'].to_numpy(dtype=float)
+            incidence = s1_result['avg_incidence_rate'].to_numpy(dtype=float)
+            priority_conditions = [
+                (coverage < 70) & (incidence > 20),
+                (coverage < 80) & (incidence > 10),
+                (coverage < 90) | (incidence > 5)
+            ]
+            s1_result['resource_priority'] = np.select(
+                priority_conditions, ['Critical Priority', 'High Priority', 'Medium Priority'], default='Low Priority'
+            )
+            s1_result['avg_coverage'] = s1_result['avg_coverage'].round(2)
+            s1_result['avg_incidence_rate'] = s1_result['avg_incidence_rate'].round(2)
+            s1_result['priority_rank'] = np.select(priority_conditions, [1, 2, 3], default=4)
+            s1_result = (
+                s1_result.sort_values(['priority_rank', 'avg_coverage'])
+                .drop(columns='priority_rank')
+                .reset_index(drop=True)
+            )
         self.results['s1_resource_allocation'] = s1_result
         
         # Scenario 2: Measles campaign effectiveness evaluation
@@ -383,8 +520,8 @@ class VaccinationAnalyst:
                 vc.coverage as measles_coverage,
                 db.incidence_rate as measles_incidence,
                 db.cases as measles_cases
-            FROM v_coverage_analysis vc
-            LEFT JOIN v_disease_burden db ON vc.country_code = db.country_code 
+            FROM mat_coverage_analysis vc
+            LEFT JOIN mat_disease_burden db ON vc.country_code = db.country_code 
                 AND vc.year = db.year 
                 AND db.disease_code = 'MEASLES'
             WHERE vc.antigen_code LIKE '%MCV%'
@@ -429,8 +566,8 @@ class VaccinationAnalyst:
                 COUNT(CASE WHEN coverage >= 95 THEN 1 END) as above_95_target,
                 COUNT(CASE WHEN coverage >= 80 THEN 1 END) as above_80_threshold,
                 AVG(coverage) as avg_coverage
-            FROM v_coverage_analysis
-            WHERE year = (SELECT MAX(year) FROM v_coverage_analysis)
+            FROM mat_coverage_analysis
+            WHERE year = (SELECT MAX(year) FROM mat_coverage_analysis)
                 AND who_region IS NOT NULL
             GROUP BY antigen_code, antigen_description, who_region
         )
@@ -452,7 +589,39 @@ class VaccinationAnalyst:
         ORDER BY antigen_code, percent_meeting_95_target DESC;
         """
         
-        s3_result = self.execute_query(query3, "Scenario 3: Progress Toward 95% Target")
+        # When the latest year is 2020 or later its rows are already in the shared
+        # recent coverage records, so aggregate those instead of scanning again
+        recent_coverage = self.get_recent_coverage()
+        if recent_coverage.empty:
+            s3_result = self.execute_query(query3, "Scenario 3: Progress Toward 95% Target")
+        else:
+            print("Analyzing: Scenario 3: Progress Toward 95% Target")
+            latest = recent_coverage[recent_coverage['year'] == recent_coverage['year'].max()]
+            latest = latest[latest['who_region'].notna()]
+            s3_result = (
+                latest.assign(above_95=latest['coverage'] >= 95, above_80=latest['coverage'] >= 80)
+                .groupby(['antigen_code', 'antigen_description', 'who_region'], dropna=False)
+                .agg(total_records=('antigen_code', 'size'),
+                     above_95_target=('above_95', 'sum'),
+                     above_80_threshold=('above_80', 'sum'),
+                     avg_coverage=('coverage', 'mean'))
+                .reset_index()
+            )
+            s3_result = s3_result[s3_result['total_records'] >= 5]
+            percent_95 = s3_result['above_95_target'] * 100.0 / s3_result['total_records']
+            s3_result = s3_result.assign(
+                percent_meeting_95_target=percent_95.round(2),
+                percent_above_80=(s3_result['above_80_threshold'] * 100.0 / s3_result['total_records']).round(2),
+                avg_coverage=s3_result['avg_coverage'].round(2),
+                progress_status=np.select([percent_95 >= 80, percent_95 >= 50],
+                                          ['On Track', 'Moderate Progress'], default='Needs Improvement')
+            )
+            s3_result = (
+                s3_result[['antigen_code', 'who_region', 'total_records', 'above_95_target',
+                           'percent_meeting_95_target', 'percent_above_80', 'avg_coverage', 'progress_status']]
+                .sort_values(['antigen_code', 'percent_meeting_95_target'], ascending=[True, False])
+                .reset_index(drop=True)
+            )
         self.results['s3_target_progress'] = s3_result
         
         return {
@@ -478,38 +647,42 @@ class VaccinationAnalyst:
                 labels={'avg_coverage': 'Average Coverage (%)', 
                        'avg_incidence_rate': 'Average Incidence Rate'}
             )
-            fig.write_html("./reports/resource_allocation_priority.html")
+            # Link a shared plotly.min.js written once next to the reports
+            # instead of embedding the full library in every HTML file
+            fig.write_html("./reports/resource_allocation_priority.html", include_plotlyjs='directory')
         
         # 2. Vaccination Drop-off Analysis
         if 'q2_dropout' in self.results:
             dropout_data = self.results['q2_dropout']
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
+            # A standalone Figure renders straight to the Agg canvas, without
+            # pyplot's GUI backend or figure registry
+            fig = Figure(figsize=(15, 6), layout='tight')
+            ax1, ax2 = fig.subplots(1, 2)
+            
+            # Grouped bars: each series sits beside the others instead of on top
+            x = np.arange(len(dropout_data))
+            labels = dropout_data['vaccine_type'].astype(str)
             
             # Coverage by dose
-            ax1.bar(dropout_data['vaccine_type'], dropout_data['avg_dose1_coverage'], 
-                   alpha=0.7, label='1st Dose')
-            ax1.bar(dropout_data['vaccine_type'], dropout_data['avg_dose2_coverage'], 
-                   alpha=0.7, label='2nd Dose')
-            ax1.bar(dropout_data['vaccine_type'], dropout_data['avg_dose3_coverage'], 
-                   alpha=0.7, label='3rd Dose')
+            w = 0.25
+            ax1.bar(x - w, dropout_data['avg_dose1_coverage'], w, alpha=0.7, label='1st Dose')
+            ax1.bar(x, dropout_data['avg_dose2_coverage'], w, alpha=0.7, label='2nd Dose')
+            ax1.bar(x + w, dropout_data['avg_dose3_coverage'], w, alpha=0.7, label='3rd Dose')
+            ax1.set_xticks(x, labels, rotation=45)
             ax1.set_title('Average Coverage by Dose')
             ax1.set_ylabel('Coverage (%)')
             ax1.legend()
-            ax1.tick_params(axis='x', rotation=45)
             
             # Dropout rates
-            ax2.bar(dropout_data['vaccine_type'], dropout_data['avg_dropout_dose1_to_2'], 
-                   alpha=0.7, label='Dose 1→2 Dropout')
-            ax2.bar(dropout_data['vaccine_type'], dropout_data['avg_dropout_dose2_to_3'], 
-                   alpha=0.7, label='Dose 2→3 Dropout')
+            w = 0.4
+            ax2.bar(x - w / 2, dropout_data['avg_dropout_dose1_to_2'], w, alpha=0.7, label='Dose 1→2 Dropout')
+            ax2.bar(x + w / 2, dropout_data['avg_dropout_dose2_to_3'], w, alpha=0.7, label='Dose 2→3 Dropout')
+            ax2.set_xticks(x, labels, rotation=45)
             ax2.set_title('Average Dropout Rates')
             ax2.set_ylabel('Dropout Rate (%)')
             ax2.legend()
-            ax2.tick_params(axis='x', rotation=45)
             
-            plt.tight_layout()
-            plt.savefig('./reports/vaccination_dropout_analysis.png', dpi=300, bbox_inches='tight')
-            plt.close()
+            fig.savefig('./reports/vaccination_dropout_analysis.png', dpi=120)
         
         # 3. Regional Coverage Comparison
         if 'q5_regional' in self.results:
@@ -521,7 +694,7 @@ class VaccinationAnalyst:
                 title='Regional Vaccination Coverage Comparison',
                 labels={'value': 'Coverage (%)', 'variable': 'Coverage Type'}
             )
-            fig.write_html("./reports/regional_coverage_comparison.html")
+            fig.write_html("./reports/regional_coverage_comparison.html", include_plotlyjs='directory')
         
         print("Visualizations created and saved to ./reports/")
     
@@ -537,22 +710,23 @@ class VaccinationAnalyst:
         report.append("EXECUTIVE SUMMARY")
         report.append("-" * 20)
         
-        if 's1_resource_allocation' in self.results:
-            critical_countries = len(self.results['s1_resource_allocation'][
-                self.results['s1_resource_allocation']['resource_priority'] == 'Critical Priority'
-            ])
+        if 's1_resource_allocation' in self.results and not self.results['s1_resource_allocation'].empty:
+            # Count matches on the column arrays rather than building a filtered copy
+            critical_countries = np.count_nonzero(
+                self.results['s1_resource_allocation']['resource_priority'].to_numpy() == 'Critical Priority'
+            )
             report.append(f"• {critical_countries} countries identified as critical priority for resource allocation")
         
         if 'q1_correlation' in self.results and not self.results['q1_correlation'].empty:
-            strong_correlations = len(self.results['q1_correlation'][
-                abs(self.results['q1_correlation']['correlation_coefficient']) > 0.5
-            ])
+            strong_correlations = np.count_nonzero(
+                np.abs(self.results['q1_correlation']['correlation_coefficient'].to_numpy(dtype=float)) > 0.5
+            )
             report.append(f"• {strong_correlations} vaccine-disease pairs show strong correlation")
         
-        if 's3_target_progress' in self.results:
-            on_track_count = len(self.results['s3_target_progress'][
-                self.results['s3_target_progress']['progress_status'] == 'On Track'
-            ])
+        if 's3_target_progress' in self.results and not self.results['s3_target_progress'].empty:
+            on_track_count = np.count_nonzero(
+                self.results['s3_target_progress']['progress_status'].to_numpy() == 'On Track'
+            )
             report.append(f"• {on_track_count} antigen-region combinations on track for 95% target")
         
         # Key Findings by Category
@@ -561,28 +735,25 @@ class VaccinationAnalyst:
         
         report.append("\n1. VACCINATION COVERAGE PATTERNS:")
         if 'q2_dropout' in self.results and not self.results['q2_dropout'].empty:
-            highest_dropout = self.results['q2_dropout'].loc[
-                self.results['q2_dropout']['avg_dropout_dose1_to_2'].idxmax()
+            highest_dropout = self.results['q2_dropout'].iloc[
+                np.nanargmax(self.results['q2_dropout']['avg_dropout_dose1_to_2'].to_numpy(dtype=float))
             ]
             report.append(f"   • Highest dropout rate: {highest_dropout['vaccine_type']} "
                          f"({highest_dropout['avg_dropout_dose1_to_2']:.2f}% between doses 1-2)")
         
         report.append("\n2. DISEASE BURDEN ANALYSIS:")
         if 'm1_intro_impact' in self.results and not self.results['m1_intro_impact'].empty:
-            best_impact = self.results['m1_intro_impact'].loc[
-                self.results['m1_intro_impact']['avg_reduction_percent'].idxmax()
+            best_impact = self.results['m1_intro_impact'].iloc[
+                np.nanargmax(self.results['m1_intro_impact']['avg_reduction_percent'].to_numpy(dtype=float))
             ]
             report.append(f"   • Most effective vaccine introduction: {best_impact['vaccine_description']} "
                          f"({best_impact['avg_reduction_percent']:.1f}% case reduction)")
         
         report.append("\n3. REGIONAL DISPARITIES:")
         if 'q5_regional' in self.results and not self.results['q5_regional'].empty:
-            best_region = self.results['q5_regional'].loc[
-                self.results['q5_regional']['avg_coverage'].idxmax()
-            ]
-            worst_region = self.results['q5_regional'].loc[
-                self.results['q5_regional']['avg_coverage'].idxmin()
-            ]
+            regional_coverage = self.results['q5_regional']['avg_coverage'].to_numpy(dtype=float)
+            best_region = self.results['q5_regional'].iloc[np.nanargmax(regional_coverage)]
+            worst_region = self.results['q5_regional'].iloc[np.nanargmin(regional_coverage)]
             report.append(f"   • Highest coverage region: {best_region['who_region']} "
                          f"({best_region['avg_coverage']:.1f}%)")
             report.append(f"   • Lowest coverage region: {worst_region['who_region']} "
@@ -620,10 +791,15 @@ class VaccinationAnalyst:
         """Run complete analysis answering all questions."""
         print("Starting comprehensive vaccination data analysis...")
         
-        # Answer all question categories
-        easy_results = self.answer_easy_questions()
-        medium_results = self.answer_medium_questions()
-        scenario_results = self.answer_scenario_questions()
+        # Answer all question categories; the batches only read the database,
+        # so each runs in its own thread on its own connection
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            easy_future = executor.submit(self.answer_easy_questions)
+            medium_future = executor.submit(self.answer_medium_questions)
+            scenario_future = executor.submit(self.answer_scenario_questions)
+            easy_results = easy_future.result()
+            medium_results = medium_future.result()
+            scenario_results = scenario_future.result()
         
         # Create visualizations
         self.create_comprehensive_visualizations()
@@ -653,12 +829,21 @@ class VaccinationAnalyst:
             'report': report
         }
     
-    def __del__(self):
-        """Close database connection."""
-        if hasattr(self, 'conn'):
-            self.conn.close()
+    def close(self):
+        """Close the database connections opened by every thread."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
 if __name__ == "__main__":
     # Run comprehensive analysis
-    analyst = VaccinationAnalyst()
-    results = analyst.run_complete_analysis()
+    with VaccinationAnalyst() as analyst:
+        results = analyst.run_complete_analysis()
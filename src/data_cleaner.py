@@ -3,18 +3,141 @@ Data Cleaning Module for Vaccination Data Analysis Project
 This module handles data cleaning, preprocessing, and quality assurance.
 """
 
+import os
+import hashlib
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import warnings
 warnings.filterwarnings('ignore')
 
+# The cleaners' rename/assign chains share unchanged columns with the raw
+# frames; Copy-on-Write (always on from pandas 3) keeps that free of copies
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+def _coerce_numeric(series):
+    """
+    Coerce a column to numbers, turning unparseable values into NaN.
+    
+    Columns that are already numeric skip pd.to_numeric's parsing pass.
+    
+    Args:
+        series (pd.Series): Column to convert
+        
+    Returns:
+        pd.Series: Numeric column
+    """
+    if not pd.api.types.is_numeric_dtype(series):
+        series = pd.to_numeric(series, errors='coerce')
+    return series
+
+def _clean_file(name, file_path, output_path, write_csv=False):
+    """
+    Clean one raw Parquet file and save the result (module level so it can run in a worker process).
+    
+    Returns:
+        tuple: Dataset name and its (missing values, duplicate records) counts
+    """
+    cleaner = VaccinationDataCleaner()
+    cleaned_df = cleaner.clean_dataset(name, pd.read_parquet(file_path, engine='pyarrow'))
+    cleaner.save_dataset(name, cleaned_df, output_path, write_csv)
+    return name, cleaner._quality_counts[name]
+
 class VaccinationDataCleaner:
     """Class to handle data cleaning and preprocessing for vaccination datasets."""
     
+    # Cleaning method for each dataset name
+    CLEANERS = {
+        'coverage': 'clean_coverage_data',
+        'incidence': 'clean_incidence_data',
+        'reported_cases': 'clean_reported_cases_data',
+        'vaccine_introduction': 'clean_vaccine_introduction_data',
+        'vaccine_schedule': 'clean_vaccine_schedule_data'
+    }
+    
+    # Low-cardinality identifier columns stored as categoricals after cleaning
+    KEY_COLUMNS = ['CODE', 'NAME', 'ANTIGEN', 'DISEASE', 'ISO_3_CODE', 'COUNTRYNAME', 'WHO_REGION']
+    
     def __init__(self):
         """Initialize the data cleaner."""
         self.cleaned_datasets = {}
+        self._quality_counts = {}
+        self._arrow = {}
+    
+    def encode_key_columns(self, df):
+        """
+        Dictionary-encode the identifier columns present in a cleaned dataset.
+        
+        Country, antigen and disease identifiers repeat across many rows, so
+        storing them as categoricals keeps one copy of each value and lets
+        grouping and duplicate checks hash small integer codes.
+        
+        Args:
+            df (pd.DataFrame): Cleaned dataset
+            
+        Returns:
+            pd.DataFrame: Dataset with categorical identifier columns
+        """
+        return df.astype({col: 'category' for col in self.KEY_COLUMNS if col in df.columns})
         
+    def _clean_common(self, df, essential_cols, zero_fill_cols=None, value_ranges=None):
+        """
+        Apply the cleaning steps shared by every dataset in one pass.
+        
+        Column names are upper-cased, rows missing an essential field or a
+        numeric year are dropped, YEAR becomes int16 (enough for every calendar
+        year in the data), numeric columns are coerced with missing values
+        counted as 0, and rows outside the allowed value ranges are removed
+        with a single combined mask. rename and assign return new frames, so
+        the raw data is never copied up front.
+        
+        Args:
+            df (pd.DataFrame): Raw dataset
+            essential_cols (list): Columns that must not be missing
+            zero_fill_cols (list): Numeric columns whose missing values count as 0
+            value_ranges (dict): Column -> inclusive (low, high) range of valid values;
+                high may be None for no upper bound
+            
+        Returns:
+            pd.DataFrame: Cleaned dataset
+        """
+        zero_fill_cols = zero_fill_cols or []
+        # Only rename the columns that are not upper-case already (the WHO
+        # files usually have none), so the frame is not rebuilt for nothing
+        renamed = {col: col.upper() for col in df.columns if col != col.upper()}
+        df_clean = (
+            (df.rename(columns=renamed) if renamed else df)
+            .dropna(subset=essential_cols)
+            .assign(
+                **{col: (lambda d, col=col: _coerce_numeric(d[col])) for col in zero_fill_cols},
+                YEAR=lambda d: _coerce_numeric(d['YEAR'])
+            )
+            # Fill every zero-filled column in one call rather than one fillna each
+            .fillna(dict.fromkeys(zero_fill_cols, 0))
+            .dropna(subset=['YEAR'])
+            .astype({'YEAR': 'int16'})
+        )
+        
+        if value_ranges:
+            # Build the mask in place, reusing one scratch buffer for every
+            # comparison, and skip the upper-bound pass for one-sided ranges
+            valid = np.ones(len(df_clean), dtype=bool)
+            scratch = np.empty(len(df_clean), dtype=bool)
+            for col, (low, high) in value_ranges.items():
+                values = df_clean[col].to_numpy()
+                np.greater_equal(values, low, out=scratch)
+                valid &= scratch
+                if high is not None:
+                    np.less_equal(values, high, out=scratch)
+                    valid &= scratch
+            df_clean = df_clean[valid]
+        
+        return self.encode_key_columns(df_clean)
+    
     def clean_coverage_data(self, df):
         """
         Clean vaccination coverage data.
@@ -26,33 +149,14 @@ class VaccinationDataCleaner:
             pd.DataFrame: Cleaned coverage data
         """
         print("Cleaning coverage data...")
-        df_clean = df.copy()
-        
-        # Standardize column names
-        df_clean.columns = df_clean.columns.str.upper()
-        
-        # Handle missing values
-        # Remove rows where essential fields are missing
-        essential_cols = ['CODE', 'NAME', 'YEAR', 'ANTIGEN']
-        df_clean = df_clean.dropna(subset=essential_cols)
-        
-        # Fill missing coverage with 0 (assuming no coverage data means 0%)
-        df_clean['COVERAGE'] = pd.to_numeric(df_clean['COVERAGE'], errors='coerce')
-        df_clean['COVERAGE'] = df_clean['COVERAGE'].fillna(0)
         
-        # Fill missing target numbers and doses with 0
-        df_clean['TARGET_NUMBER'] = pd.to_numeric(df_clean['TARGET_NUMBER'], errors='coerce')
-        df_clean['DOSES'] = pd.to_numeric(df_clean['DOSES'], errors='coerce')
-        df_clean['TARGET_NUMBER'] = df_clean['TARGET_NUMBER'].fillna(0)
-        df_clean['DOSES'] = df_clean['DOSES'].fillna(0)
-        
-        # Ensure year is integer
-        df_clean['YEAR'] = pd.to_numeric(df_clean['YEAR'], errors='coerce')
-        df_clean = df_clean.dropna(subset=['YEAR'])
-        df_clean['YEAR'] = df_clean['YEAR'].astype(int)
-        
-        # Remove invalid coverage values (should be between 0 and 100)
-        df_clean = df_clean[(df_clean['COVERAGE'] >= 0) & (df_clean['COVERAGE'] <= 200)]  # Allow up to 200% for some reporting variations
+        # Missing coverage, target numbers and doses count as 0; coverage up to
+        # 200% is allowed for some reporting variations
+        df_clean = self._clean_common(
+            df, ['CODE', 'NAME', 'YEAR', 'ANTIGEN'],
+            zero_fill_cols=['COVERAGE', 'TARGET_NUMBER', 'DOSES'],
+            value_ranges={'COVERAGE': (0, 200)}
+        )
         
         print(f"Coverage data cleaned: {df_clean.shape}")
         return df_clean
@@ -68,26 +172,13 @@ class VaccinationDataCleaner:
             pd.DataFrame: Cleaned incidence data
         """
         print("Cleaning incidence data...")
-        df_clean = df.copy()
-        
-        # Standardize column names
-        df_clean.columns = df_clean.columns.str.upper()
-        
-        # Handle missing values
-        essential_cols = ['CODE', 'NAME', 'YEAR', 'DISEASE']
-        df_clean = df_clean.dropna(subset=essential_cols)
-        
-        # Clean incidence rate
-        df_clean['INCIDENCE_RATE'] = pd.to_numeric(df_clean['INCIDENCE_RATE'], errors='coerce')
-        df_clean['INCIDENCE_RATE'] = df_clean['INCIDENCE_RATE'].fillna(0)
-        
-        # Ensure year is integer
-        df_clean['YEAR'] = pd.to_numeric(df_clean['YEAR'], errors='coerce')
-        df_clean = df_clean.dropna(subset=['YEAR'])
-        df_clean['YEAR'] = df_clean['YEAR'].astype(int)
         
         # Remove negative incidence rates
-        df_clean = df_clean[df_clean['INCIDENCE_RATE'] >= 0]
+        df_clean = self._clean_common(
+            df, ['CODE', 'NAME', 'YEAR', 'DISEASE'],
+            zero_fill_cols=['INCIDENCE_RATE'],
+            value_ranges={'INCIDENCE_RATE': (0, None)}
+        )
         
         print(f"Incidence data cleaned: {df_clean.shape}")
         return df_clean
@@ -103,26 +194,13 @@ class VaccinationDataCleaner:
             pd.DataFrame: Cleaned reported cases data
         """
         print("Cleaning reported cases data...")
-        df_clean = df.copy()
-        
-        # Standardize column names
-        df_clean.columns = df_clean.columns.str.upper()
-        
-        # Handle missing values
-        essential_cols = ['CODE', 'NAME', 'YEAR', 'DISEASE']
-        df_clean = df_clean.dropna(subset=essential_cols)
-        
-        # Clean cases count
-        df_clean['CASES'] = pd.to_numeric(df_clean['CASES'], errors='coerce')
-        df_clean['CASES'] = df_clean['CASES'].fillna(0)
-        
-        # Ensure year is integer
-        df_clean['YEAR'] = pd.to_numeric(df_clean['YEAR'], errors='coerce')
-        df_clean = df_clean.dropna(subset=['YEAR'])
-        df_clean['YEAR'] = df_clean['YEAR'].astype(int)
         
         # Remove negative case counts
-        df_clean = df_clean[df_clean['CASES'] >= 0]
+        df_clean = self._clean_common(
+            df, ['CODE', 'NAME', 'YEAR', 'DISEASE'],
+            zero_fill_cols=['CASES'],
+            value_ranges={'CASES': (0, None)}
+        )
         
         print(f"Reported cases data cleaned: {df_clean.shape}")
         return df_clean
@@ -138,22 +216,14 @@ class VaccinationDataCleaner:
             pd.DataFrame: Cleaned vaccine introduction data
         """
         print("Cleaning vaccine introduction data...")
-        df_clean = df.copy()
-        
-        # Standardize column names
-        df_clean.columns = df_clean.columns.str.upper()
+        df_clean = self._clean_common(df, ['ISO_3_CODE', 'COUNTRYNAME', 'YEAR'])
         
-        # Handle missing values
-        essential_cols = ['ISO_3_CODE', 'COUNTRYNAME', 'YEAR']
-        df_clean = df_clean.dropna(subset=essential_cols)
-        
-        # Ensure year is integer
-        df_clean['YEAR'] = pd.to_numeric(df_clean['YEAR'], errors='coerce')
-        df_clean = df_clean.dropna(subset=['YEAR'])
-        df_clean['YEAR'] = df_clean['YEAR'].astype(int)
-        
-        # Clean introduction status
-        df_clean['INTRO'] = df_clean['INTRO'].fillna('Unknown')
+        # Clean introduction status; it has only a handful of values, so it is
+        # stored as a categorical and missing entries take the 'Unknown' category
+        intro = df_clean['INTRO'].astype('category')
+        if 'Unknown' not in intro.cat.categories:
+            intro = intro.cat.add_categories('Unknown')
+        df_clean['INTRO'] = intro.fillna('Unknown')
         
         print(f"Vaccine introduction data cleaned: {df_clean.shape}")
         return df_clean
@@ -169,78 +239,257 @@ class VaccinationDataCleaner:
             pd.DataFrame: Cleaned vaccine schedule data
         """
         print("Cleaning vaccine schedule data...")
-        df_clean = df.copy()
-        
-        # Standardize column names
-        df_clean.columns = df_clean.columns.str.upper()
-        
-        # Handle missing values
-        essential_cols = ['ISO_3_CODE', 'COUNTRYNAME', 'YEAR']
-        df_clean = df_clean.dropna(subset=essential_cols)
-        
-        # Ensure year is integer
-        df_clean['YEAR'] = pd.to_numeric(df_clean['YEAR'], errors='coerce')
-        df_clean = df_clean.dropna(subset=['YEAR'])
-        df_clean['YEAR'] = df_clean['YEAR'].astype(int)
+        df_clean = self._clean_common(df, ['ISO_3_CODE', 'COUNTRYNAME', 'YEAR'])
         
         print(f"Vaccine schedule data cleaned: {df_clean.shape}")
         return df_clean
     
-    def clean_all_datasets(self, datasets):
+    def clean_all_datasets(self, datasets, output_path=None, max_workers=None, write_csv=False):
         """
         Clean all vaccination datasets.
         
+        The datasets are independent, so each one is cleaned (and saved) in its
+        own thread; the vectorized pandas steps and the Arrow writers release
+        the GIL for much of their work, so the datasets proceed side by side.
+        
         Args:
             datasets (dict): Dictionary of raw datasets
+            output_path (str): When given, each cleaned dataset is also saved
+                there (see save_dataset) as soon as it is cleaned
+            max_workers (int): Number of threads (defaults to one per dataset,
+                capped at the CPU count)
+            write_csv (bool): Also save CSV copies (only with output_path)
             
         Returns:
             dict: Dictionary of cleaned datasets
         """
         print("Starting data cleaning process...")
         
-        if 'coverage' in datasets:
-            self.cleaned_datasets['coverage'] = self.clean_coverage_data(datasets['coverage'])
+        names = [name for name in datasets if name in self.CLEANERS]
+        if max_workers is None:
+            max_workers = min(len(names), os.cpu_count() or 1) or 1
         
-        if 'incidence' in datasets:
-            self.cleaned_datasets['incidence'] = self.clean_incidence_data(datasets['incidence'])
+        def clean_and_save(name):
+            cleaned_df = self.clean_dataset(name, datasets[name])
+            if output_path is not None:
+                self.save_dataset(name, cleaned_df, output_path, write_csv)
         
-        if 'reported_cases' in datasets:
-            self.cleaned_datasets['reported_cases'] = self.clean_reported_cases_data(datasets['reported_cases'])
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # list() re-raises the first error from any worker
+            list(executor.map(clean_and_save, names))
         
-        if 'vaccine_introduction' in datasets:
-            self.cleaned_datasets['vaccine_introduction'] = self.clean_vaccine_introduction_data(datasets['vaccine_introduction'])
+        # Keep the input order regardless of which dataset finished first
+        self.cleaned_datasets = {
+            name: self.cleaned_datasets[name]
+            for name in [*names, *self.cleaned_datasets] if name in self.cleaned_datasets
+        }
         
-        if 'vaccine_schedule' in datasets:
-            self.cleaned_datasets['vaccine_schedule'] = self.clean_vaccine_schedule_data(datasets['vaccine_schedule'])
+        print("Data cleaning completed!")
+        return self.cleaned_datasets
+    
+    def clean_files(self, file_paths, output_path="./cleaned_data", max_workers=None, write_csv=False):
+        """
+        Clean raw datasets stored as Parquet files in worker processes.
+        
+        Each worker reads its own raw file, cleans it and saves the cleaned
+        Parquet file, so no frame is pickled to a worker and every dataset gets
+        a core of its own; the cleaned files are then read back here.
+        
+        Args:
+            file_paths (dict): Dataset name -> raw Parquet file (e.g. the copies
+                written by VaccinationDataLoader.convert_to_parquet)
+            output_path (str): Path to save cleaned data files
+            max_workers (int): Number of worker processes (defaults to one per
+                dataset, capped at the CPU count)
+            write_csv (bool): Also save CSV copies
+            
+        Returns:
+            dict: Dictionary of cleaned datasets
+        """
+        print("Starting data cleaning process...")
+        
+        names = [name for name in file_paths if name in self.CLEANERS]
+        if max_workers is None:
+            max_workers = min(len(names), os.cpu_count() or 1) or 1
+        
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_clean_file, name, file_paths[name], output_path, write_csv)
+                for name in names
+            ]
+            for future in futures:
+                name, counts = future.result()
+                self.cleaned_datasets[name] = pd.read_parquet(
+                    f"{output_path}/{name}_cleaned.parquet", engine='pyarrow'
+                )
+                self._arrow.pop(name, None)
+                self._quality_counts[name] = counts
         
         print("Data cleaning completed!")
         return self.cleaned_datasets
     
-    def save_cleaned_data(self, output_path="./cleaned_data"):
+    def clean_dataset(self, name, df):
+        """
+        Clean a single dataset.
+        
+        Args:
+            name (str): Dataset name (a key of CLEANERS)
+            df (pd.DataFrame): Raw dataset
+            
+        Returns:
+            pd.DataFrame: Cleaned dataset
+        """
+        cleaned_df = getattr(self, self.CLEANERS[name])(df)
+        self.cleaned_datasets[name] = cleaned_df
+        # Lay the dataset out as Arrow once; saving and get_arrow share it
+        self._arrow[name] = pa.Table.from_pandas(cleaned_df, preserve_index=False)
+        # Count missing values and duplicates now, while the data is hot and
+        # (in clean_all_datasets) alongside the other datasets' cleaning
+        self._quality_counts[name] = self._count_quality_issues(cleaned_df)
+        return cleaned_df
+    
+    def get_arrow(self, name):
+        """
+        Get a cleaned dataset as a PyArrow Table.
+        
+        The table built during cleaning is returned as is; datasets loaded from
+        the cache are converted on first use and the table is kept.
+        
+        Args:
+            name (str): Dataset name
+            
+        Returns:
+            pa.Table: Cleaned dataset (categoricals become dictionary columns)
+        """
+        if name not in self._arrow:
+            self._arrow[name] = pa.Table.from_pandas(self.cleaned_datasets[name], preserve_index=False)
+        return self._arrow[name]
+    
+    @staticmethod
+    def _count_quality_issues(df):
+        """Return the (missing values, duplicate records) counts of a dataset."""
+        return int(df.isnull().sum().sum()), int(df.duplicated().sum())
+    
+    @staticmethod
+    def compute_input_hash(datasets):
+        """
+        Compute a content hash of raw datasets.
+        
+        Args:
+            datasets (dict): Dictionary of raw datasets
+            
+        Returns:
+            str: Hex digest covering dataset names, columns and values
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for name in sorted(datasets):
+            df = datasets[name]
+            digest.update(name.encode())
+            digest.update(",".join(map(str, df.columns)).encode())
+            digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        return digest.hexdigest()
+    
+    def load_cached_cleaned_data(self, input_hash, output_path="./cleaned_data"):
+        """
+        Load previously saved cleaned datasets if they came from the same raw data.
+        
+        Args:
+            input_hash (str): Hash of the raw datasets (see compute_input_hash)
+            output_path (str): Path the cleaned data files were saved to
+            
+        Returns:
+            dict: Dictionary of cleaned datasets, or None if the cache is stale or missing
+        """
+        hash_file = f"{output_path}/.input_hash"
+        if not os.path.exists(hash_file):
+            return None
+        
+        with open(hash_file) as f:
+            names = f.read().split()
+        if not names or names[0] != input_hash:
+            return None
+        
+        existing = {entry.name for entry in os.scandir(output_path)}
+        if not all(f"{name}_cleaned.parquet" in existing for name in names[1:]):
+            return None
+        
+        file_paths = {name: f"{output_path}/{name}_cleaned.parquet" for name in names[1:]}
+        
+        for name, file_path in file_paths.items():
+            self.cleaned_datasets[name] = pd.read_parquet(file_path, engine='pyarrow')
+            self._arrow.pop(name, None)
+            print(f"Loaded cached {name} data from {file_path}")
+        return self.cleaned_datasets
+    
+    def save_dataset(self, name, df, output_path="./cleaned_data", write_csv=False):
         """
-        Save cleaned datasets to CSV files.
+        Save a single cleaned dataset to a Parquet file, and optionally CSV.
         
         Args:
+            name (str): Dataset name
+            df (pd.DataFrame): Cleaned dataset
             output_path (str): Path to save cleaned data files
+            write_csv (bool): Also write a CSV copy for manual inspection
         """
-        import os
         os.makedirs(output_path, exist_ok=True)
         
+        # Reuse the table built during cleaning when saving that same frame; the
+        # CSV copy, when wanted, is written from it with the Arrow CSV writer
+        if df is self.cleaned_datasets.get(name):
+            table = self.get_arrow(name)
+        else:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        file_path = f"{output_path}/{name}_cleaned.parquet"
+        pq.write_table(table, file_path, compression='zstd')
+        if write_csv:
+            pa_csv.write_csv(table, f"{output_path}/{name}_cleaned.csv")
+        print(f"Saved {name} data to {file_path}")
+    
+    def save_input_hash(self, input_hash, output_path="./cleaned_data"):
+        """
+        Record the raw data hash the saved cleaned datasets were built from.
+        
+        Must be called after the datasets are saved, so an interrupted save
+        never looks like a valid cache to load_cached_cleaned_data.
+        
+        Args:
+            input_hash (str): Hash of the raw datasets (see compute_input_hash)
+            output_path (str): Path the cleaned data files were saved to
+        """
+        with open(f"{output_path}/.input_hash", "w") as f:
+            f.write("\n".join([input_hash, *self.cleaned_datasets]))
+    
+    def save_cleaned_data(self, output_path="./cleaned_data", input_hash=None, write_csv=False):
+        """
+        Save cleaned datasets to Parquet files, and optionally CSV.
+        
+        The Parquet files keep the cleaned dtypes and are what the later
+        pipeline steps read back; CSV copies are only for manual inspection.
+        
+        Args:
+            output_path (str): Path to save cleaned data files
+            input_hash (str): Hash of the raw datasets; when given it is stored so
+                load_cached_cleaned_data can reuse these files on the next run
+            write_csv (bool): Also write CSV copies
+        """
         for name, df in self.cleaned_datasets.items():
-            file_path = f"{output_path}/{name}_cleaned.csv"
-            df.to_csv(file_path, index=False)
-            print(f"Saved {name} data to {file_path}")
+            self.save_dataset(name, df, output_path, write_csv)
+        
+        if input_hash is not None:
+            self.save_input_hash(input_hash, output_path)
     
     def get_data_quality_report(self):
         """Generate a data quality report for cleaned datasets."""
         report = {}
         
         for name, df in self.cleaned_datasets.items():
+            # Counted during cleaning; datasets loaded from the cache are counted here
+            missing_values, duplicate_records = self._quality_counts.get(name) or self._count_quality_issues(df)
             report[name] = {
                 'total_records': len(df),
                 'total_columns': len(df.columns),
-                'missing_values': df.isnull().sum().sum(),
-                'duplicate_records': df.duplicated().sum(),
+                'missing_values': missing_values,
+                'duplicate_records': duplicate_records,
                 'data_types': df.dtypes.to_dict(),
                 'year_range': (df['YEAR'].min(), df['YEAR'].max()) if 'YEAR' in df.columns else None,
                 'unique_countries': df['CODE'].nunique() if 'CODE' in df.columns else 
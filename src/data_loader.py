@@ -3,101 +3,317 @@ Data Loader Module for Vaccination Data Analysis Project
 This module handles loading and initial processing of vaccination-related datasets.
 """
 
+import os
+import hashlib
+import zipfile
 import pandas as pd
 import numpy as np
+try:
+    import python_calamine  # noqa: F401  (optional Rust-backed Excel parser)
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import warnings
 warnings.filterwarnings('ignore')
 
+# Dataset name -> (source file, label used in log messages)
+DATASET_FILES = {
+    'coverage': ('coverage-data.xlsx', 'Coverage data'),
+    'incidence': ('incidence-rate-data.xlsx', 'Incidence data'),
+    'reported_cases': ('reported-cases-data.xlsx', 'Reported cases data'),
+    'vaccine_introduction': ('vaccine-introduction-data.xlsx', 'Vaccine introduction data'),
+    'vaccine_schedule': ('vaccine-schedule-data.xlsx', 'Vaccine schedule data')
+}
+
+def _parse_excel(file_path):
+    """
+    Parse the first sheet of an Excel file.
+    
+    Uses the calamine engine when python-calamine is installed, which parses
+    far faster than the default openpyxl engine.
+    """
+    if HAS_CALAMINE:
+        try:
+            return pd.read_excel(file_path, engine='calamine')
+        except ValueError as e:
+            # pandas < 2.2 has no calamine engine
+            print(f"Could not parse {file_path} with calamine, using openpyxl: {e}")
+    
+    return pd.read_excel(file_path)
+
+def _parquet_source(file_path):
+    """Return the path of the Parquet copy kept next to an Excel source file."""
+    return f"{os.path.splitext(file_path)[0]}.parquet"
+
+def _source_exists(file_path):
+    """Return True if an Excel file or its Parquet copy exists."""
+    return os.path.exists(file_path) or os.path.exists(_parquet_source(file_path))
+
+def _cache_file(file_path, cache_path):
+    """Return the cache path for an Excel file, keyed by its path, modification time and size."""
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}:{stat.st_mtime}:{stat.st_size}"
+    return f"{cache_path}/{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}.parquet"
+
+def _parquet_available(file_path, cache_path=None):
+    """Return True if _read_excel can load the file from Parquet without parsing Excel."""
+    parquet_path = _parquet_source(file_path)
+    if os.path.exists(parquet_path) and (
+            not os.path.exists(file_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(file_path)):
+        return True
+    try:
+        return cache_path is not None and os.path.exists(_cache_file(file_path, cache_path))
+    except OSError:
+        return False
+
+def _read_excel(file_path, cache_path=None):
+    """
+    Read a single Excel file (module level so it can run in a worker process).
+    
+    A Parquet copy next to the Excel file (see
+    VaccinationDataLoader.convert_to_parquet) is read instead when it is at
+    least as new as the Excel file, or when the Excel file is missing.
+    Otherwise, when a cache directory is given, the parsed sheet is stored there
+    as Parquet under a key built from the file path, modification time and size,
+    and later reads of the unchanged file load the Parquet copy instead of
+    parsing Excel.
+    
+    Args:
+        file_path (str): Path to the Excel file
+        cache_path (str): Directory for cached Parquet copies, or None to disable
+    """
+    parquet_path = _parquet_source(file_path)
+    if os.path.exists(parquet_path) and (
+            not os.path.exists(file_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(file_path)):
+        return pd.read_parquet(parquet_path, engine='pyarrow')
+    
+    if cache_path is None:
+        return _parse_excel(file_path)
+    
+    cache_file = _cache_file(file_path, cache_path)
+    if os.path.exists(cache_file):
+        return pd.read_parquet(cache_file, engine='pyarrow')
+    
+    df = _parse_excel(file_path)
+    try:
+        os.makedirs(cache_path, exist_ok=True)
+        df.to_parquet(cache_file, engine='pyarrow', index=False)
+    except Exception as e:
+        # Columns with mixed types cannot be stored as Parquet; just skip caching
+        print(f"Could not cache {file_path}: {e}")
+    return df
+
+def downcast_dtypes(df):
+    """
+    Shrink a DataFrame's dtypes in place.
+    
+    Integer columns are downcast to the smallest dtype that holds their
+    values, float columns become float32 only when that changes none of their
+    values, and low-cardinality text columns become categoricals.
+    
+    Args:
+        df (pd.DataFrame): DataFrame to shrink
+        
+    Returns:
+        pd.DataFrame: The same DataFrame with smaller dtypes
+    """
+    for col in df.select_dtypes(include='integer').columns:
+        downcast = 'unsigned' if df[col].min() >= 0 else 'integer'
+        df[col] = pd.to_numeric(df[col], downcast=downcast)
+    
+    # float32 cannot hold most decimals exactly (93.7 becomes 93.69999694...),
+    # so a float column is only narrowed when every value survives the round trip
+    for col in df.select_dtypes(include='floating').columns:
+        narrowed = pd.to_numeric(df[col], downcast='float')
+        if narrowed.dtype != df[col].dtype and narrowed.astype(df[col].dtype).equals(df[col]):
+            df[col] = narrowed
+    
+    # Only pure text columns; mixed number/text columns are parsed by the cleaner
+    for col in df.select_dtypes(include=['object', 'string']).columns:
+        if (df[col].nunique() < 0.5 * len(df)
+                and pd.api.types.infer_dtype(df[col], skipna=True) == 'string'):
+            df[col] = df[col].astype('category')
+    
+    return df
+
 class VaccinationDataLoader:
     """Class to handle loading and initial processing of vaccination datasets."""
     
-    def __init__(self, data_path):
+    def __init__(self, data_path, cache_path="./cache"):
         """
         Initialize the data loader with the path to data files.
         
         Args:
             data_path (str): Path to the directory containing Excel files
+            cache_path (str): Directory for Parquet copies of parsed Excel files,
+                or None to always parse the Excel files
         """
         self.data_path = data_path
+        self.cache_path = cache_path
         self.datasets = {}
+        self._executor = None
+        self._pending = {}
         
-    def load_coverage_data(self):
-        """Load vaccination coverage data from Excel file."""
+    def _load_dataset(self, name):
+        """
+        Load one dataset by its DATASET_FILES name.
+        
+        A missing source (neither the Excel file nor its Parquet copy exists)
+        returns None without raising; only I/O and parse errors of an existing
+        file are caught, so unrelated failures still surface.
+        
+        Args:
+            name (str): Dataset name, e.g. 'coverage'
+            
+        Returns:
+            pd.DataFrame: The loaded data, or None if it could not be read
+        """
+        file_name, label = DATASET_FILES[name]
+        file_path = f"{self.data_path}/{file_name}"
+        if not _source_exists(file_path):
+            print(f"Error loading {label.lower()}: {file_path} not found")
+            return None
         try:
-            file_path = f"{self.data_path}/coverage-data.xlsx"
-            df = pd.read_excel(file_path)
-            print(f"Coverage data loaded: {df.shape}")
-            print(f"Columns: {list(df.columns)}")
-            self.datasets['coverage'] = df
-            return df
-        except Exception as e:
-            print(f"Error loading coverage data: {e}")
+            df = _read_excel(file_path, self.cache_path)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            print(f"Error loading {label.lower()}: {e}")
             return None
+        print(f"{label} loaded: {df.shape}")
+        print(f"Columns: {list(df.columns)}")
+        self.datasets[name] = df
+        return df
+    
+    def load_coverage_data(self):
+        """Load vaccination coverage data from Excel file."""
+        return self._load_dataset('coverage')
     
     def load_incidence_data(self):
         """Load disease incidence rate data from Excel file."""
-        try:
-            file_path = f"{self.data_path}/incidence-rate-data.xlsx"
-            df = pd.read_excel(file_path)
-            print(f"Incidence data loaded: {df.shape}")
-            print(f"Columns: {list(df.columns)}")
-            self.datasets['incidence'] = df
-            return df
-        except Exception as e:
-            print(f"Error loading incidence data: {e}")
-            return None
+        return self._load_dataset('incidence')
     
     def load_reported_cases_data(self):
         """Load reported disease cases data from Excel file."""
-        try:
-            file_path = f"{self.data_path}/reported-cases-data.xlsx"
-            df = pd.read_excel(file_path)
-            print(f"Reported cases data loaded: {df.shape}")
-            print(f"Columns: {list(df.columns)}")
-            self.datasets['reported_cases'] = df
-            return df
-        except Exception as e:
-            print(f"Error loading reported cases data: {e}")
-            return None
+        return self._load_dataset('reported_cases')
     
     def load_vaccine_introduction_data(self):
         """Load vaccine introduction data from Excel file."""
-        try:
-            file_path = f"{self.data_path}/vaccine-introduction-data.xlsx"
-            df = pd.read_excel(file_path)
-            print(f"Vaccine introduction data loaded: {df.shape}")
-            print(f"Columns: {list(df.columns)}")
-            self.datasets['vaccine_introduction'] = df
-            return df
-        except Exception as e:
-            print(f"Error loading vaccine introduction data: {e}")
-            return None
+        return self._load_dataset('vaccine_introduction')
     
     def load_vaccine_schedule_data(self):
         """Load vaccine schedule data from Excel file."""
-        try:
-            file_path = f"{self.data_path}/vaccine-schedule-data.xlsx"
-            df = pd.read_excel(file_path)
-            print(f"Vaccine schedule data loaded: {df.shape}")
-            print(f"Columns: {list(df.columns)}")
-            self.datasets['vaccine_schedule'] = df
-            return df
-        except Exception as e:
-            print(f"Error loading vaccine schedule data: {e}")
-            return None
+        return self._load_dataset('vaccine_schedule')
     
-    def load_all_datasets(self):
-        """Load all vaccination datasets."""
+    def prefetch_all_datasets(self, max_workers=None):
+        """
+        Start parsing all Excel files in the background.
+        
+        The files are parsed in worker processes while the caller carries on;
+        load_all_datasets collects the results. When every file can be read
+        from Parquet, threads are used instead: pyarrow releases the GIL while
+        reading, and the DataFrames need not be pickled back from workers.
+        
+        Args:
+            max_workers (int): Number of workers (defaults to one per file,
+                capped at the CPU count)
+        """
+        if self._pending:
+            return
+        # Datasets whose source is missing are reported here and skipped
+        file_paths = {}
+        for name, (file_name, label) in DATASET_FILES.items():
+            file_path = f"{self.data_path}/{file_name}"
+            if _source_exists(file_path):
+                file_paths[name] = file_path
+            else:
+                print(f"Error loading {label.lower()}: {file_path} not found")
+        if not file_paths:
+            return
+        if max_workers is None:
+            max_workers = min(len(file_paths), os.cpu_count() or 1)
+        
+        if all(_parquet_available(file_path, self.cache_path) for file_path in file_paths.values()):
+            self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        else:
+            self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        self._pending = {
+            self._executor.submit(_read_excel, file_path, self.cache_path): name
+            for name, file_path in file_paths.items()
+        }
+    
+    def load_all_datasets(self, max_workers=None, downcast=True):
+        """
+        Load all vaccination datasets.
+        
+        The Excel files are independent and parsing them is CPU bound, so each
+        file is parsed in its own worker process, or read in its own thread when
+        it is available as Parquet (started here unless prefetch_all_datasets
+        already did so). Each dataset is post-processed as soon as its file is
+        read, while the others are still in flight.
+        
+        Args:
+            max_workers (int): Number of workers (defaults to one per file,
+                capped at the CPU count)
+            downcast (bool): Shrink dtypes of the loaded data (see downcast_dtypes)
+        """
         print("Loading all vaccination datasets...")
-        self.load_coverage_data()
-        self.load_incidence_data()
-        self.load_reported_cases_data()
-        self.load_vaccine_introduction_data()
-        self.load_vaccine_schedule_data()
+        self.prefetch_all_datasets(max_workers)
+        
+        # Gather into a local dict and publish it in one assignment
+        loaded = dict(self.datasets)
+        try:
+            for future in as_completed(self._pending):
+                name = self._pending[future]
+                label = DATASET_FILES[name][1]
+                try:
+                    df = future.result()
+                except (OSError, ValueError, zipfile.BadZipFile) as e:
+                    print(f"Error loading {label.lower()}: {e}")
+                    continue
+                print(f"{label} loaded: {df.shape}")
+                print(f"Columns: {list(df.columns)}")
+                loaded[name] = downcast_dtypes(df) if downcast else df
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+            self._executor = None
+            self._pending = {}
+        
+        # Keep the usual dataset order regardless of which file finished first
+        self.datasets = {name: loaded[name] for name in DATASET_FILES if name in loaded}
         
         print(f"\nDatasets loaded: {list(self.datasets.keys())}")
         return self.datasets
     
+    def convert_to_parquet(self, compression='zstd'):
+        """
+        Write a Parquet copy next to each Excel source file.
+        
+        Later loads read these copies instead of parsing the Excel files, until
+        an Excel file is modified again.
+        
+        Args:
+            compression (str): Parquet compression codec
+            
+        Returns:
+            list: Paths of the Parquet files written
+        """
+        written = []
+        for file_name, label in DATASET_FILES.values():
+            file_path = f"{self.data_path}/{file_name}"
+            if not _source_exists(file_path):
+                print(f"Error converting {label.lower()}: {file_path} not found")
+                continue
+            try:
+                df = _read_excel(file_path, self.cache_path)
+                parquet_path = _parquet_source(file_path)
+                df.to_parquet(parquet_path, engine='pyarrow', compression=compression, index=False)
+                print(f"{label} converted: {parquet_path}")
+                written.append(parquet_path)
+            except (OSError, ValueError, zipfile.BadZipFile) as e:
+                print(f"Error converting {label.lower()}: {e}")
+        return written
+    
     def get_basic_info(self):
         """Get basic information about all loaded datasets."""
         info = {}
@@ -4,23 +4,171 @@ This module creates and populates SQL database with cleaned vaccination data.
 """
 
 import pandas as pd
+import numpy as np
 import sqlite3
 from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Fact table, source-to-target column mapping and log label for each cleaned dataset
+FACT_TABLES = {
+    'coverage': ('fact_vaccination_coverage', {
+        'CODE': 'country_code', 'YEAR': 'year', 'ANTIGEN': 'antigen_code',
+        'COVERAGE_CATEGORY': 'coverage_category',
+        'COVERAGE_CATEGORY_DESCRIPTION': 'coverage_category_description',
+        'TARGET_NUMBER': 'target_number', 'DOSES': 'doses', 'COVERAGE': 'coverage'
+    }, 'coverage'),
+    'incidence': ('fact_disease_incidence', {
+        'CODE': 'country_code', 'YEAR': 'year', 'DISEASE': 'disease_code',
+        'DENOMINATOR': 'denominator', 'INCIDENCE_RATE': 'incidence_rate'
+    }, 'incidence'),
+    'reported_cases': ('fact_reported_cases', {
+        'CODE': 'country_code', 'YEAR': 'year', 'DISEASE': 'disease_code', 'CASES': 'cases'
+    }, 'reported cases'),
+    'vaccine_introduction': ('fact_vaccine_introduction', {
+        'ISO_3_CODE': 'country_code', 'YEAR': 'year',
+        'DESCRIPTION': 'vaccine_description', 'INTRO': 'introduction_status'
+    }, 'vaccine introduction'),
+    'vaccine_schedule': ('fact_vaccine_schedule', {
+        'ISO_3_CODE': 'country_code', 'YEAR': 'year', 'VACCINECODE': 'vaccine_code',
+        'VACCINE_DESCRIPTION': 'vaccine_description', 'SCHEDULEROUNDS': 'schedule_rounds',
+        'TARGETPOP': 'target_population', 'TARGETPOP_DESCRIPTION': 'target_population_description',
+        'GEOAREA': 'geo_area', 'AGEADMINISTERED': 'age_administered',
+        'SOURCECOMMENT': 'source_comment'
+    }, 'vaccine schedule')
+}
+
+# Extra columns of each cleaned dataset read by populate_dimension_tables
+DIMENSION_COLUMNS = {
+    'coverage': ['NAME', 'ANTIGEN_DESCRIPTION'],
+    'incidence': ['DISEASE_DESCRIPTION'],
+    'vaccine_introduction': ['WHO_REGION']
+}
+
+def load_columns(name):
+    """Return the columns of a cleaned dataset that the database load uses."""
+    return [*FACT_TABLES[name][1], *DIMENSION_COLUMNS.get(name, [])]
+
+# Rows per executemany call when bulk inserting fact tables
+INSERT_BATCH_SIZE = 10000
+
+# Bound parameters per multi-row INSERT issued by to_sql (older SQLite builds
+# cap a statement at 999)
+MAX_SQL_PARAMETERS = 900
+
+def _coverage_levels(df):
+    """Classify coverage as High (95%+), Medium (80%+) or Low."""
+    coverage = df['COVERAGE'].to_numpy()
+    return np.select([coverage >= 95, coverage >= 80], ['High', 'Medium'], 'Low')
+
+def _incidence_levels(df):
+    """Classify incidence rates as High (over 100), Medium (over 10) or Low."""
+    incidence_rate = df['INCIDENCE_RATE'].to_numpy()
+    return np.select([incidence_rate > 100, incidence_rate > 10], ['High', 'Medium'], 'Low')
+
+# Fact table columns computed from a cleaned dataset while it is loaded
+DERIVED_COLUMNS = {
+    'coverage': {'coverage_level': _coverage_levels},
+    'incidence': {'incidence_level': _incidence_levels}
+}
+
+def fact_columns(name):
+    """Return the fact table columns loaded from a cleaned dataset."""
+    return [*FACT_TABLES[name][1].values(), *DERIVED_COLUMNS.get(name, {})]
+
+def _fact_row_batches(name, df):
+    """Yield the fact table rows of a cleaned dataset as lists of plain tuples."""
+    derived = {column: func(df) for column, func in DERIVED_COLUMNS.get(name, {}).items()}
+    fact_df = df[list(FACT_TABLES[name][1])].assign(**derived)
+    for start in range(0, len(fact_df), INSERT_BATCH_SIZE):
+        batch = fact_df.iloc[start:start + INSERT_BATCH_SIZE]
+        # Box each column to Python values in one C-level tolist() and zip the
+        # columns into rows; only columns with missing values take the slower
+        # object path that turns NaN into None
+        columns = [
+            batch[col].astype(object).where(batch[col].notna(), None).tolist()
+            if batch[col].hasnans else batch[col].tolist()
+            for col in batch.columns
+        ]
+        yield list(zip(*columns))
+
+def _stage_fact_table(name, df):
+    """Build one fact table in an in-memory database and return it serialized (module level so it can run in a worker process)."""
+    table_name = FACT_TABLES[name][0]
+    columns = fact_columns(name)
+    placeholders = ", ".join("?" * len(columns))
+    
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute(f"CREATE TABLE {table_name} ({', '.join(columns)})")
+        for rows in _fact_row_batches(name, df):
+            conn.executemany(f"INSERT INTO {table_name} VALUES ({placeholders})", rows)
+        conn.commit()
+        return conn.serialize()
+    finally:
+        conn.close()
+
+def _one_row_per_key(df, key, column):
+    """
+    Keep one row per key, preferring rows where column is filled.
+    
+    Among the filled rows the first occurrence wins; a key whose rows are all
+    missing the column keeps its first row.
+    
+    Args:
+        df (pd.DataFrame): Dimension rows
+        key (str): Primary key column
+        column (str): Column whose missing values should lose to filled ones
+        
+    Returns:
+        pd.DataFrame: One row per key, in the original row order
+    """
+    return (
+        df.sort_values(column, key=lambda values: values.isna(), kind='stable')
+        .drop_duplicates(subset=key)
+        .sort_index()
+    )
 
 class VaccinationDatabaseManager:
     """Class to manage SQL database operations for vaccination data."""
     
-    def __init__(self, db_path="vaccination_data.db"):
+    def __init__(self, db_path="vaccination_data.db", to_sql_method='multi'):
         """
         Initialize database manager.
         
         Args:
             db_path (str): Path to SQLite database file
+            to_sql_method (str): Insertion method passed to DataFrame.to_sql for
+                the dimension tables; 'multi' batches rows into multi-row
+                INSERTs, None inserts one row per statement (for engines
+                that do not support multi-row VALUES)
         """
         self.db_path = db_path
-        self.engine = create_engine(f'sqlite:///{db_path}')
+        # Pool the file connections explicitly (SQLAlchemy 1.4 would open a new
+        # one per connect()); LIFO hands every setup step the same warm
+        # connection, and there is no pre-ping round trip before each use
+        self.engine = create_engine(
+            f'sqlite:///{db_path}', poolclass=QueuePool, pool_size=4, max_overflow=2,
+            pool_use_lifo=True, pool_pre_ping=False,
+            connect_args={'check_same_thread': False}
+        )
         self.connection = None
+        self.to_sql_method = to_sql_method
+    
+    def _to_sql(self, df, table_name, conn):
+        """
+        Replace the rows of a schema table with the contents of a DataFrame.
+        
+        The table is emptied and appended to rather than replaced, so it keeps
+        the types, keys and indexes from create_database_schema.
+        """
+        chunksize = None
+        if self.to_sql_method == 'multi':
+            chunksize = max(1, MAX_SQL_PARAMETERS // len(df.columns))
+        conn.exec_driver_sql(f"DELETE FROM {table_name}")
+        df.to_sql(table_name, conn, if_exists='append', index=False,
+                  method=self.to_sql_method, chunksize=chunksize)
         
     def create_database_schema(self):
         """Create database schema with proper table structures."""
@@ -32,19 +180,19 @@ class VaccinationDatabaseManager:
             country_code TEXT PRIMARY KEY,
             country_name TEXT NOT NULL,
             who_region TEXT
-        );
+        ) WITHOUT ROWID;
         
         -- Antigens/Vaccines dimension table
         CREATE TABLE IF NOT EXISTS dim_antigens (
             antigen_code TEXT PRIMARY KEY,
             antigen_description TEXT NOT NULL
-        );
+        ) WITHOUT ROWID;
         
         -- Diseases dimension table
         CREATE TABLE IF NOT EXISTS dim_diseases (
             disease_code TEXT PRIMARY KEY,
             disease_description TEXT NOT NULL
-        );
+        ) WITHOUT ROWID;
         
         -- Years dimension table
         CREATE TABLE IF NOT EXISTS dim_years (
@@ -64,6 +212,7 @@ class VaccinationDatabaseManager:
             target_number INTEGER,
             doses INTEGER,
             coverage REAL,
+            coverage_level TEXT,
             FOREIGN KEY (country_code) REFERENCES dim_countries(country_code),
             FOREIGN KEY (year) REFERENCES dim_years(year),
             FOREIGN KEY (antigen_code) REFERENCES dim_antigens(antigen_code)
@@ -77,6 +226,7 @@ class VaccinationDatabaseManager:
             disease_code TEXT,
             denominator TEXT,
             incidence_rate REAL,
+            incidence_level TEXT,
             FOREIGN KEY (country_code) REFERENCES dim_countries(country_code),
             FOREIGN KEY (year) REFERENCES dim_years(year),
             FOREIGN KEY (disease_code) REFERENCES dim_diseases(disease_code)
@@ -118,153 +268,303 @@ class VaccinationDatabaseManager:
             geo_area TEXT,
             age_administered TEXT,
             source_comment TEXT,
+            area_type TEXT,
             FOREIGN KEY (country_code) REFERENCES dim_countries(country_code),
             FOREIGN KEY (year) REFERENCES dim_years(year)
         );
-        
-        -- Create indexes for better performance
-        CREATE INDEX IF NOT EXISTS idx_coverage_country_year ON fact_vaccination_coverage(country_code, year);
-        CREATE INDEX IF NOT EXISTS idx_incidence_country_year ON fact_disease_incidence(country_code, year);
-        CREATE INDEX IF NOT EXISTS idx_cases_country_year ON fact_reported_cases(country_code, year);
-        CREATE INDEX IF NOT EXISTS idx_coverage_antigen ON fact_vaccination_coverage(antigen_code);
-        CREATE INDEX IF NOT EXISTS idx_incidence_disease ON fact_disease_incidence(disease_code);
         """
         
         with self.engine.connect() as conn:
-            # Split and execute each statement
-            statements = schema_sql.split(';')
-            for statement in statements:
-                if statement.strip():
-                    conn.execute(text(statement))
+            # Run the whole script in one call to SQLite's multi-statement API
+            conn.connection.dbapi_connection.executescript(schema_sql)
+            
+            # Databases created before a derived column existed get it added here
+            for name, derived in DERIVED_COLUMNS.items():
+                table_name = FACT_TABLES[name][0]
+                table_columns = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table_name})")}
+                for column in derived:
+                    if column not in table_columns:
+                        conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {column} TEXT")
             conn.commit()
         
         print("Database schema created successfully!")
     
-    def populate_dimension_tables(self, datasets):
-        """Populate dimension tables with reference data."""
+    def create_indexes(self, conn=None):
+        """
+        Create indexes on the fact tables (run after the bulk load).
+        
+        Args:
+            conn: Open connection (outside a transaction) to build them through;
+                when omitted a new one is opened
+        """
+        if conn is None:
+            with self.engine.connect() as conn:
+                return self.create_indexes(conn)
+        
+        print("Creating indexes...")
+        
+        # The country/year indexes cover the views' join keys and measures, so
+        # their joins read the index alone; they supersede the narrower
+        # (country_code, year) indexes of older databases
+        index_sql = """
+        DROP INDEX IF EXISTS idx_coverage_country_year;
+        DROP INDEX IF EXISTS idx_incidence_country_year;
+        DROP INDEX IF EXISTS idx_cases_country_year;
+        CREATE INDEX IF NOT EXISTS idx_cov_cya ON fact_vaccination_coverage(country_code, year, antigen_code, coverage, target_number, doses);
+        CREATE INDEX IF NOT EXISTS idx_inc_cyd ON fact_disease_incidence(country_code, year, disease_code, incidence_rate, incidence_level);
+        CREATE INDEX IF NOT EXISTS idx_cases_cyd ON fact_reported_cases(country_code, year, disease_code, cases);
+        CREATE INDEX IF NOT EXISTS idx_coverage_antigen ON fact_vaccination_coverage(antigen_code);
+        CREATE INDEX IF NOT EXISTS idx_incidence_disease ON fact_disease_incidence(disease_code);
+        """
+        
+        conn.connection.dbapi_connection.executescript(index_sql)
+        conn.commit()
+        
+        print("Indexes created successfully!")
+    
+    def drop_indexes(self, conn):
+        """
+        Drop the indexes on the fact tables of an existing database.
+        
+        Lets a reload into an existing database insert without maintaining the
+        indexes of the previous build; create_indexes and
+        create_materialized_tables build them again afterwards.
+        
+        Args:
+            conn: Open connection (outside a transaction)
+        """
+        fact_tables = [table_name for table_name, _, _ in FACT_TABLES.values()]
+        placeholders = ", ".join("?" * len(fact_tables))
+        # Indexes without SQL are the automatic ones behind key constraints
+        index_names = [row[0] for row in conn.exec_driver_sql(
+            f"SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            f"AND tbl_name IN ({placeholders})", tuple(fact_tables)
+        )]
+        for index_name in index_names:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index_name}")
+        conn.commit()
+    
+    def populate_dimension_tables(self, datasets, conn=None):
+        """
+        Populate dimension tables with reference data.
+        
+        Args:
+            datasets (dict): Dictionary of cleaned datasets
+            conn: Open connection to load through; when omitted a new one is
+                opened and committed
+        """
+        if conn is None:
+            with self.engine.begin() as conn:
+                return self.populate_dimension_tables(datasets, conn)
+        
         print("Populating dimension tables...")
         
-        with self.engine.connect() as conn:
-            # Populate countries dimension
-            if 'coverage' in datasets:
-                countries_df = datasets['coverage'][['CODE', 'NAME']].drop_duplicates()
-                countries_df.columns = ['country_code', 'country_name']
-                
-                # Add WHO regions if available
-                if 'vaccine_introduction' in datasets:
-                    who_regions = datasets['vaccine_introduction'][['ISO_3_CODE', 'WHO_REGION']].drop_duplicates()
-                    who_regions.columns = ['country_code', 'who_region']
-                    countries_df = countries_df.merge(who_regions, on='country_code', how='left')
-                
-                countries_df.to_sql('dim_countries', conn, if_exists='replace', index=False)
-                print(f"Inserted {len(countries_df)} countries")
+        # Populate countries dimension
+        if 'coverage' in datasets:
+            countries_df = datasets['coverage'][['CODE', 'NAME']].drop_duplicates()
+            countries_df.columns = ['country_code', 'country_name']
             
-            # Populate antigens dimension
-            if 'coverage' in datasets:
-                antigens_df = datasets['coverage'][['ANTIGEN', 'ANTIGEN_DESCRIPTION']].drop_duplicates()
-                antigens_df.columns = ['antigen_code', 'antigen_description']
-                antigens_df.to_sql('dim_antigens', conn, if_exists='replace', index=False)
-                print(f"Inserted {len(antigens_df)} antigens")
+            # Add WHO regions if available
+            if 'vaccine_introduction' in datasets:
+                who_regions = datasets['vaccine_introduction'][['ISO_3_CODE', 'WHO_REGION']].drop_duplicates()
+                who_regions.columns = ['country_code', 'who_region']
+                countries_df = countries_df.merge(who_regions, on='country_code', how='left')
             
-            # Populate diseases dimension
-            if 'incidence' in datasets:
-                diseases_df = datasets['incidence'][['DISEASE', 'DISEASE_DESCRIPTION']].drop_duplicates()
-                diseases_df.columns = ['disease_code', 'disease_description']
-                diseases_df.to_sql('dim_diseases', conn, if_exists='replace', index=False)
-                print(f"Inserted {len(diseases_df)} diseases")
+            # One row per key, as the table's primary key requires
+            countries_df = _one_row_per_key(countries_df, 'country_code', 'who_region')
+            self._to_sql(countries_df, 'dim_countries', conn)
+            print(f"Inserted {len(countries_df)} countries")
+        
+        # Populate antigens dimension
+        if 'coverage' in datasets:
+            antigens_df = datasets['coverage'][['ANTIGEN', 'ANTIGEN_DESCRIPTION']].drop_duplicates()
+            antigens_df.columns = ['antigen_code', 'antigen_description']
+            # The description is NOT NULL: antigens never described fall back to their code
+            antigens_df = _one_row_per_key(antigens_df, 'antigen_code', 'antigen_description').astype(object)
+            antigens_df['antigen_description'] = antigens_df['antigen_description'].fillna(antigens_df['antigen_code'])
+            self._to_sql(antigens_df, 'dim_antigens', conn)
+            print(f"Inserted {len(antigens_df)} antigens")
+        
+        # Populate diseases dimension
+        if 'incidence' in datasets:
+            diseases_df = datasets['incidence'][['DISEASE', 'DISEASE_DESCRIPTION']].drop_duplicates()
+            diseases_df.columns = ['disease_code', 'disease_description']
+            diseases_df = _one_row_per_key(diseases_df, 'disease_code', 'disease_description').astype(object)
+            diseases_df['disease_description'] = diseases_df['disease_description'].fillna(diseases_df['disease_code'])
+            self._to_sql(diseases_df, 'dim_diseases', conn)
+            print(f"Inserted {len(diseases_df)} diseases")
+        
+        # Populate years dimension
+        # Hash out each dataset's few distinct years, then sort the union once
+        all_years = np.unique(np.concatenate([
+            np.empty(0, dtype='int64'),
+            *(dataset['YEAR'].unique() for dataset in datasets.values() if 'YEAR' in dataset.columns)
+        ]))
+        
+        years_df = pd.DataFrame({'year': all_years})
+        years_df['decade'] = (years_df['year'] // 10) * 10
+        years_df['period'] = pd.cut(
+            years_df['year'], bins=[-np.inf, 2000, 2010, 2020, np.inf], right=False,
+            labels=['Pre-2000', '2000-2010', '2010-2020', '2020+']
+        )
+        self._to_sql(years_df, 'dim_years', conn)
+        print(f"Inserted {len(years_df)} years")
+    
+    def stage_fact_tables(self, datasets, conn, max_workers=None):
+        """
+        Build the fact tables side by side in worker processes and attach them to conn.
+        
+        SQLite only allows one writer, so each worker fills its own in-memory
+        database; the results are attached here and copied in with plain
+        INSERT ... SELECT statements. Must be called outside a transaction.
+        
+        Args:
+            datasets (dict): Dictionary of cleaned datasets
+            conn: Open database connection
+            max_workers (int): Number of worker processes (defaults to one per table,
+                capped at the CPU count)
             
-            # Populate years dimension
-            all_years = set()
-            for dataset in datasets.values():
-                if 'YEAR' in dataset.columns:
-                    all_years.update(dataset['YEAR'].unique())
+        Returns:
+            dict: Attached schema name for each staged dataset (empty if staging failed)
+        """
+        names = [name for name in datasets if name in FACT_TABLES]
+        if not names:
+            return {}
+        if max_workers is None:
+            max_workers = min(len(names), os.cpu_count() or 1)
+        
+        staged = {}
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                # Only the fact columns are pickled to the workers
+                futures = {
+                    name: executor.submit(_stage_fact_table, name, datasets[name][list(FACT_TABLES[name][1])])
+                    for name in names
+                }
+                
+                raw_conn = conn.connection.dbapi_connection
+                for name, future in futures.items():
+                    data = future.result()
+                    schema = f"staging_{name}"
+                    conn.exec_driver_sql(f"ATTACH DATABASE ':memory:' AS {schema}")
+                    staged[name] = schema
+                    raw_conn.deserialize(data, name=schema)
+        except Exception as e:
+            print(f"Could not stage fact tables in parallel, loading them serially: {e}")
+            self.detach_staged_tables(staged, conn)
+            staged = {}
+        
+        conn.commit()
+        return staged
+    
+    def detach_staged_tables(self, staged, conn):
+        """
+        Detach the in-memory databases attached by stage_fact_tables.
+        
+        Args:
+            staged (dict): Attached schema name for each staged dataset
+            conn: Open database connection (outside a transaction)
+        """
+        for schema in staged.values():
+            conn.exec_driver_sql(f"DETACH DATABASE {schema}")
+        conn.commit()
+    
+    def populate_fact_table(self, name, df, conn, staged_schema=None):
+        """
+        Populate the fact table built from a single cleaned dataset.
+        
+        Args:
+            name (str): Dataset name (a key of FACT_TABLES)
+            df (pd.DataFrame): Cleaned dataset
+            conn: Open database connection
+            staged_schema (str): Attached schema holding the already built table
+                (see stage_fact_tables); when omitted the rows are inserted directly
             
-            years_df = pd.DataFrame({'year': sorted(all_years)})
-            years_df['decade'] = (years_df['year'] // 10) * 10
-            years_df['period'] = years_df['year'].apply(lambda x: 
-                'Pre-2000' if x < 2000 else
-                '2000-2010' if x < 2010 else
-                '2010-2020' if x < 2020 else
-                '2020+'
+        Returns:
+            int: Number of inserted records
+        """
+        table_name, _, label = FACT_TABLES[name]
+        fact_cols = fact_columns(name)
+        columns = ", ".join(fact_cols)
+        
+        conn.exec_driver_sql(f"DELETE FROM {table_name}")
+        conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = ?", (table_name,))
+        
+        if staged_schema is not None:
+            conn.exec_driver_sql(
+                f"INSERT INTO main.{table_name} ({columns}) SELECT {columns} FROM {staged_schema}.{table_name}"
             )
-            years_df.to_sql('dim_years', conn, if_exists='replace', index=False)
-            print(f"Inserted {len(years_df)} years")
-            
-            conn.commit()
+        else:
+            # Insert raw tuples into the typed table from the schema in batches,
+            # instead of letting to_sql recreate it row object by row object
+            placeholders = ", ".join("?" * len(fact_cols))
+            insert_sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
+            for rows in _fact_row_batches(name, df):
+                conn.exec_driver_sql(insert_sql, rows)
+        
+        print(f"Inserted {len(df)} {label} records")
+        return len(df)
     
-    def populate_fact_tables(self, datasets):
-        """Populate fact tables with vaccination and disease data."""
+    def populate_fact_tables(self, datasets, conn=None, staged=None):
+        """
+        Populate fact tables with vaccination and disease data.
+        
+        Args:
+            datasets (dict): Dictionary of cleaned datasets
+            conn: Open connection to load through; when omitted a new one is
+                opened and committed
+            staged (dict): Attached schema name for each dataset already built
+                by stage_fact_tables
+        """
+        if conn is None:
+            with self.engine.begin() as conn:
+                return self.populate_fact_tables(datasets, conn, staged)
+        
         print("Populating fact tables...")
+        staged = staged or {}
         
-        with self.engine.connect() as conn:
-            # Vaccination coverage fact table
-            if 'coverage' in datasets:
-                coverage_fact = datasets['coverage'][[
-                    'CODE', 'YEAR', 'ANTIGEN', 'COVERAGE_CATEGORY', 
-                    'COVERAGE_CATEGORY_DESCRIPTION', 'TARGET_NUMBER', 'DOSES', 'COVERAGE'
-                ]].copy()
-                coverage_fact.columns = [
-                    'country_code', 'year', 'antigen_code', 'coverage_category',
-                    'coverage_category_description', 'target_number', 'doses', 'coverage'
-                ]
-                coverage_fact.to_sql('fact_vaccination_coverage', conn, if_exists='replace', index=False)
-                print(f"Inserted {len(coverage_fact)} coverage records")
-            
-            # Disease incidence fact table
-            if 'incidence' in datasets:
-                incidence_fact = datasets['incidence'][[
-                    'CODE', 'YEAR', 'DISEASE', 'DENOMINATOR', 'INCIDENCE_RATE'
-                ]].copy()
-                incidence_fact.columns = [
-                    'country_code', 'year', 'disease_code', 'denominator', 'incidence_rate'
-                ]
-                incidence_fact.to_sql('fact_disease_incidence', conn, if_exists='replace', index=False)
-                print(f"Inserted {len(incidence_fact)} incidence records")
-            
-            # Reported cases fact table
-            if 'reported_cases' in datasets:
-                cases_fact = datasets['reported_cases'][['CODE', 'YEAR', 'DISEASE', 'CASES']].copy()
-                cases_fact.columns = ['country_code', 'year', 'disease_code', 'cases']
-                cases_fact.to_sql('fact_reported_cases', conn, if_exists='replace', index=False)
-                print(f"Inserted {len(cases_fact)} reported cases records")
-            
-            # Vaccine introduction fact table
-            if 'vaccine_introduction' in datasets:
-                intro_fact = datasets['vaccine_introduction'][[
-                    'ISO_3_CODE', 'YEAR', 'DESCRIPTION', 'INTRO'
-                ]].copy()
-                intro_fact.columns = [
-                    'country_code', 'year', 'vaccine_description', 'introduction_status'
-                ]
-                intro_fact.to_sql('fact_vaccine_introduction', conn, if_exists='replace', index=False)
-                print(f"Inserted {len(intro_fact)} vaccine introduction records")
-            
-            # Vaccine schedule fact table
-            if 'vaccine_schedule' in datasets:
-                schedule_fact = datasets['vaccine_schedule'][[
-                    'ISO_3_CODE', 'YEAR', 'VACCINECODE', 'VACCINE_DESCRIPTION',
-                    'SCHEDULEROUNDS', 'TARGETPOP', 'TARGETPOP_DESCRIPTION',
-                    'GEOAREA', 'AGEADMINISTERED', 'SOURCECOMMENT'
-                ]].copy()
-                schedule_fact.columns = [
-                    'country_code', 'year', 'vaccine_code', 'vaccine_description',
-                    'schedule_rounds', 'target_population', 'target_population_description',
-                    'geo_area', 'age_administered', 'source_comment'
-                ]
-                schedule_fact.to_sql('fact_vaccine_schedule', conn, if_exists='replace', index=False)
-                print(f"Inserted {len(schedule_fact)} vaccine schedule records")
-            
-            conn.commit()
+        for name, df in datasets.items():
+            if name in FACT_TABLES:
+                self.populate_fact_table(name, df, conn, staged.get(name))
         
         print("All fact tables populated successfully!")
     
     def create_analytical_views(self):
-        """Create analytical views for common queries."""
+        """
+        Create analytical views for common queries.
+        
+        The views are recreated on every setup so that existing databases
+        pick up changed definitions. The antigen-to-disease pairs used by
+        v_vaccination_effectiveness are matched once per antigen into
+        dim_antigen_disease_map (run after the dimension tables are loaded),
+        so the view equi-joins on it instead of pattern matching every row.
+        """
         print("Creating analytical views...")
         
         views_sql = """
+        -- Diseases each antigen protects against, matched once per antigen code
+        DROP TABLE IF EXISTS dim_antigen_disease_map;
+        CREATE TABLE dim_antigen_disease_map (
+            antigen_code TEXT,
+            disease_code TEXT,
+            PRIMARY KEY (antigen_code, disease_code)
+        ) WITHOUT ROWID;
+        INSERT INTO dim_antigen_disease_map (antigen_code, disease_code)
+        SELECT da.antigen_code, p.disease_code
+        FROM dim_antigens da
+        JOIN (
+            SELECT '%DTP%' AS pattern, 'DIPHTHERIA' AS disease_code
+            UNION ALL SELECT '%MCV%', 'MEASLES'
+            UNION ALL SELECT '%POL%', 'POLIOMYELITIS'
+            UNION ALL SELECT '%HepB%', 'HEPATITISB'
+        ) p ON da.antigen_code LIKE p.pattern
+        UNION
+        SELECT antigen_code, 'TUBERCULOSIS' FROM dim_antigens WHERE antigen_code = 'BCG';
+        
         -- View for coverage analysis with country and antigen details
-        CREATE VIEW IF NOT EXISTS v_coverage_analysis AS
+        DROP VIEW IF EXISTS v_vaccination_effectiveness;
+        DROP VIEW IF EXISTS v_coverage_analysis;
+        CREATE VIEW v_coverage_analysis AS
         SELECT 
             fc.country_code,
             dc.country_name,
@@ -277,18 +577,15 @@ class VaccinationDatabaseManager:
             fc.coverage,
             fc.target_number,
             fc.doses,
-            CASE 
-                WHEN fc.coverage >= 95 THEN 'High'
-                WHEN fc.coverage >= 80 THEN 'Medium'
-                ELSE 'Low'
-            END AS coverage_level
+            fc.coverage_level
         FROM fact_vaccination_coverage fc
         JOIN dim_countries dc ON fc.country_code = dc.country_code
         JOIN dim_years dy ON fc.year = dy.year
         JOIN dim_antigens da ON fc.antigen_code = da.antigen_code;
         
         -- View for disease burden analysis
-        CREATE VIEW IF NOT EXISTS v_disease_burden AS
+        DROP VIEW IF EXISTS v_disease_burden;
+        CREATE VIEW v_disease_burden AS
         SELECT 
             fdi.country_code,
             dc.country_name,
@@ -299,11 +596,7 @@ class VaccinationDatabaseManager:
             dd.disease_description,
             fdi.incidence_rate,
             frc.cases,
-            CASE 
-                WHEN fdi.incidence_rate > 100 THEN 'High'
-                WHEN fdi.incidence_rate > 10 THEN 'Medium'
-                ELSE 'Low'
-            END AS incidence_level
+            fdi.incidence_level
         FROM fact_disease_incidence fdi
         JOIN dim_countries dc ON fdi.country_code = dc.country_code
         JOIN dim_years dy ON fdi.year = dy.year
@@ -312,7 +605,7 @@ class VaccinationDatabaseManager:
             AND fdi.year = frc.year AND fdi.disease_code = frc.disease_code;
         
         -- View for vaccination effectiveness analysis
-        CREATE VIEW IF NOT EXISTS v_vaccination_effectiveness AS
+        CREATE VIEW v_vaccination_effectiveness AS
         SELECT 
             vc.country_code,
             vc.country_name,
@@ -326,26 +619,90 @@ class VaccinationDatabaseManager:
             db.incidence_rate,
             db.cases
         FROM v_coverage_analysis vc
-        LEFT JOIN v_disease_burden db ON vc.country_code = db.country_code 
+        JOIN dim_antigen_disease_map m ON vc.antigen_code = m.antigen_code
+        JOIN v_disease_burden db ON vc.country_code = db.country_code 
             AND vc.year = db.year
-        WHERE (
-            (vc.antigen_code LIKE '%DTP%' AND db.disease_code = 'DIPHTHERIA') OR
-            (vc.antigen_code LIKE '%MCV%' AND db.disease_code = 'MEASLES') OR
-            (vc.antigen_code LIKE '%POL%' AND db.disease_code = 'POLIOMYELITIS') OR
-            (vc.antigen_code = 'BCG' AND db.disease_code = 'TUBERCULOSIS') OR
-            (vc.antigen_code LIKE '%HepB%' AND db.disease_code = 'HEPATITISB')
-        );
+            AND db.disease_code = m.disease_code;
         """
         
         with self.engine.connect() as conn:
-            statements = views_sql.split(';')
-            for statement in statements:
-                if statement.strip():
-                    conn.execute(text(statement))
+            conn.connection.dbapi_connection.executescript(views_sql)
             conn.commit()
         
         print("Analytical views created successfully!")
     
+    def create_materialized_tables(self):
+        """
+        Materialize v_coverage_analysis into an indexed table.
+        
+        The analysis queries scan the coverage view repeatedly; storing it once
+        with a covering index avoids re-running its joins for every query.
+        The dose number (trailing digit of the antigen code, 0 if none) and
+        vaccine type (first three characters) are stored as columns so the
+        dose drop-off analysis does not parse antigen codes row by row.
+        Most analysis queries only look at 2020 onwards, so those rows are
+        also kept in mat_coverage_2020plus, which they scan in full instead
+        of filtering the whole history; its covering indexes, led by the
+        country, antigen and region keys the summaries group on, let those
+        GROUP BYs read rows in key order without a temporary sort.
+        v_disease_burden (joined to coverage by several queries) and
+        v_vaccination_effectiveness are stored as mat_disease_burden and
+        mat_vaccination_effectiveness the same way. Schedule rows get their
+        area_type (Urban, Rural, National or Other) derived from geo_area.
+        """
+        print("Materializing analysis tables...")
+        
+        materialize_sql = """
+        DROP TABLE IF EXISTS mat_coverage_analysis;
+        CREATE TABLE mat_coverage_analysis AS
+        SELECT 
+            *,
+            CAST(SUBSTR(antigen_code, -1, 1) AS INTEGER) AS dose_number,
+            SUBSTR(antigen_code, 1, 3) AS vaccine_type
+        FROM v_coverage_analysis;
+        CREATE INDEX idx_mat_coverage_year_region ON mat_coverage_analysis(year, who_region, antigen_code, country_code, coverage);
+        CREATE INDEX idx_mat_coverage_dose ON mat_coverage_analysis(year, vaccine_type, dose_number);
+        DROP TABLE IF EXISTS mat_coverage_2020plus;
+        CREATE TABLE mat_coverage_2020plus AS
+        SELECT * FROM mat_coverage_analysis WHERE year >= 2020;
+        CREATE INDEX idx_mat_recent_country ON mat_coverage_2020plus(country_name, who_region, coverage);
+        CREATE INDEX idx_mat_recent_antigen ON mat_coverage_2020plus(antigen_code, antigen_description, coverage);
+        CREATE INDEX idx_mat_recent_region ON mat_coverage_2020plus(who_region, country_code, coverage);
+        DROP TABLE IF EXISTS mat_disease_burden;
+        CREATE TABLE mat_disease_burden AS
+        SELECT * FROM v_disease_burden;
+        CREATE INDEX idx_mat_burden_country_year ON mat_disease_burden(country_code, year, disease_code, incidence_rate);
+        CREATE INDEX idx_mat_burden_disease ON mat_disease_burden(disease_code, disease_description, year, incidence_rate, cases, country_code);
+        DROP TABLE IF EXISTS mat_vaccination_effectiveness;
+        CREATE TABLE mat_vaccination_effectiveness AS
+        SELECT * FROM v_vaccination_effectiveness
+        """
+        
+        # Classify each schedule row's geographic area once, so the urban/rural
+        # analysis groups on a stored column instead of matching geo_area text
+        area_type_sql = """
+        UPDATE fact_vaccine_schedule SET area_type = CASE 
+            WHEN UPPER(geo_area) LIKE '%URBAN%' THEN 'Urban'
+            WHEN UPPER(geo_area) LIKE '%RURAL%' THEN 'Rural'
+            WHEN UPPER(geo_area) LIKE '%NATIONAL%' THEN 'National'
+            ELSE 'Other'
+        END;
+        CREATE INDEX IF NOT EXISTS idx_schedule_year_area ON fact_vaccine_schedule(year, area_type)
+        """
+        
+        with self.engine.connect() as conn:
+            raw_conn = conn.connection.dbapi_connection
+            raw_conn.executescript(materialize_sql)
+            
+            # Databases created before the column existed get it added here
+            schedule_columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(fact_vaccine_schedule)")}
+            if 'area_type' not in schedule_columns:
+                conn.exec_driver_sql("ALTER TABLE fact_vaccine_schedule ADD COLUMN area_type TEXT")
+            raw_conn.executescript(area_type_sql)
+            conn.commit()
+        
+        print("Materialized tables created successfully!")
+    
     def create_sample_queries(self):
         """Create and save sample SQL queries for analysis."""
         print("Creating sample queries...")
@@ -539,13 +896,19 @@ ORDER BY percent_above_95 DESC;
    - decade: Decade grouping
    - period: Period classification
 
+5. **dim_antigen_disease_map**: Disease each antigen protects against
+   - antigen_code, disease_code (PK): Pairs matched from the antigen codes
+     (DTP, MCV, POL, HepB and BCG families)
+
 ### Fact Tables
 1. **fact_vaccination_coverage**: Vaccination coverage data
    - Measures: coverage, target_number, doses
+   - Coverage level (High 95%+, Medium 80%+, Low), stored at load time
    - Dimensions: country, year, antigen
 
 2. **fact_disease_incidence**: Disease incidence rates
    - Measures: incidence_rate
+   - Incidence level (High over 100, Medium over 10, Low), stored at load time
    - Dimensions: country, year, disease
 
 3. **fact_reported_cases**: Reported disease cases
@@ -558,13 +921,24 @@ ORDER BY percent_above_95 DESC;
 
 5. **fact_vaccine_schedule**: Vaccine administration schedules
    - Measures: schedule details
-   - Dimensions: country, year
+   - Dimensions: country, year, area_type (Urban/Rural/National/Other, derived from geo_area)
 
 ### Analytical Views
 1. **v_coverage_analysis**: Enhanced coverage data with classifications
 2. **v_disease_burden**: Disease burden analysis with severity levels
 3. **v_vaccination_effectiveness**: Coverage vs. incidence correlation
 
+### Materialized Tables
+1. **mat_coverage_analysis**: Snapshot of v_coverage_analysis rebuilt on every setup,
+   plus dose_number and vaccine_type columns derived from antigen_code;
+   indexed on (year, who_region, antigen_code, country_code, coverage) and
+   (year, vaccine_type, dose_number)
+2. **mat_coverage_2020plus**: Rows of mat_coverage_analysis with year >= 2020,
+   scanned by the recent-coverage analysis queries
+3. **mat_disease_burden**: Snapshot of v_disease_burden, indexed on
+   (country_code, year, disease_code) for joins to coverage
+4. **mat_vaccination_effectiveness**: Snapshot of v_vaccination_effectiveness
+
 ## Usage Guidelines
 - Use views for most analytical queries
 - Filter by recent years (>= 2020) for current analysis
@@ -582,14 +956,91 @@ ORDER BY percent_above_95 DESC;
         
         print("Database documentation saved to ./sql/database_documentation.md")
     
-    def setup_complete_database(self, datasets):
-        """Set up complete database with all components."""
+    @staticmethod
+    def _fast_pragmas(conn):
+        """
+        Relax durability and enlarge SQLite's caches for a bulk load.
+        
+        The database is rebuilt from the cleaned data on every run, so a crash
+        mid-load only means running the setup again.
+        """
+        conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        conn.exec_driver_sql("PRAGMA journal_mode=MEMORY")
+        conn.exec_driver_sql("PRAGMA temp_store=MEMORY")
+        conn.exec_driver_sql("PRAGMA cache_size=-200000")
+        conn.commit()
+    
+    @staticmethod
+    def _restore_pragmas(conn):
+        """Restore the SQLite defaults changed by _fast_pragmas."""
+        conn.exec_driver_sql("PRAGMA journal_mode=DELETE")
+        conn.exec_driver_sql("PRAGMA synchronous=FULL")
+        conn.exec_driver_sql("PRAGMA temp_store=DEFAULT")
+        conn.exec_driver_sql("PRAGMA cache_size=-2000")
+        conn.commit()
+    
+    def load_datasets(self, datasets, conn=None):
+        """
+        Bulk load the dimension and fact tables in a single transaction.
+        
+        The fact tables are staged in parallel first (see stage_fact_tables).
+        
+        Args:
+            datasets (dict): Dictionary of cleaned datasets
+            conn: Open connection (outside a transaction) to load through; when
+                omitted a new one is opened with bulk load pragmas (see
+                _fast_pragmas) for the duration of the load
+        """
+        if conn is None:
+            with self.engine.connect() as conn:
+                self._fast_pragmas(conn)
+                try:
+                    return self.load_datasets(datasets, conn)
+                finally:
+                    self._restore_pragmas(conn)
+        
+        staged = self.stage_fact_tables(datasets, conn)
+        try:
+            with conn.begin():
+                self.populate_dimension_tables(datasets, conn)
+                self.populate_fact_tables(datasets, conn, staged)
+        finally:
+            self.detach_staged_tables(staged, conn)
+    
+    def setup_complete_database(self, datasets, defer_indexes=True):
+        """
+        Set up complete database with all components.
+        
+        Args:
+            datasets (dict): Dictionary of cleaned datasets
+            defer_indexes (bool): Create the indexes after the bulk load instead of
+                maintaining them row by row during it
+        """
         print("Setting up complete vaccination database...")
         
         self.create_database_schema()
-        self.populate_dimension_tables(datasets)
-        self.populate_fact_tables(datasets)
+        if not defer_indexes:
+            self.create_indexes()
+        # Load and index through one connection, under the bulk load pragmas
+        with self.engine.connect() as conn:
+            self._fast_pragmas(conn)
+            try:
+                if defer_indexes:
+                    self.drop_indexes(conn)
+                self.load_datasets(datasets, conn)
+                if defer_indexes:
+                    self.create_indexes(conn)
+            finally:
+                self._restore_pragmas(conn)
         self.create_analytical_views()
+        self.create_materialized_tables()
+        
+        # Give the query planner row counts and index selectivity
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql("ANALYZE")
+            conn.exec_driver_sql("PRAGMA optimize")
+            conn.commit()
+        
         self.create_sample_queries()
         self.generate_database_documentation()
         
@@ -597,11 +1048,11 @@ ORDER BY percent_above_95 DESC;
         
         # Verify database
         with self.engine.connect() as conn:
-            tables_result = conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'"))
-            tables = [row[0] for row in tables_result]
-            
-            views_result = conn.execute(text("SELECT name FROM sqlite_master WHERE type='view'"))
-            views = [row[0] for row in views_result]
+            result = conn.execute(text("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'view')"))
+            objects = {'table': [], 'view': []}
+            for row in result:
+                objects[row.type].append(row.name)
+            tables, views = objects['table'], objects['view']
             
             print(f"Created {len(tables)} tables: {', '.join(tables)}")
             print(f"Created {len(views)} views: {', '.join(views)}")
@@ -612,16 +1063,23 @@ if __name__ == "__main__":
     # Load cleaned datasets
     cleaned_datasets = {}
     data_files = {
-        'coverage': './cleaned_data/coverage_cleaned.csv',
-        'incidence': './cleaned_data/incidence_cleaned.csv',
-        'reported_cases': './cleaned_data/reported_cases_cleaned.csv',
-        'vaccine_introduction': './cleaned_data/vaccine_introduction_cleaned.csv',
-        'vaccine_schedule': './cleaned_data/vaccine_schedule_cleaned.csv'
+        'coverage': './cleaned_data/coverage_cleaned.parquet',
+        'incidence': './cleaned_data/incidence_cleaned.parquet',
+        'reported_cases': './cleaned_data/reported_cases_cleaned.parquet',
+        'vaccine_introduction': './cleaned_data/vaccine_introduction_cleaned.parquet',
+        'vaccine_schedule': './cleaned_data/vaccine_schedule_cleaned.parquet'
     }
     
-    for name, file_path in data_files.items():
-        if os.path.exists(file_path):
-            cleaned_datasets[name] = pd.read_csv(file_path)
+    # Read only the columns the load uses; the rest are never held in memory.
+    # pyarrow releases the GIL while decoding, so the files are read side by side
+    existing = {name: path for name, path in data_files.items() if os.path.exists(path)}
+    with ThreadPoolExecutor(max_workers=max(1, len(existing))) as executor:
+        futures = {
+            name: executor.submit(pd.read_parquet, file_path, engine='pyarrow', columns=load_columns(name))
+            for name, file_path in existing.items()
+        }
+        for name, future in futures.items():
+            cleaned_datasets[name] = future.result()
             print(f"Loaded {name} dataset: {cleaned_datasets[name].shape}")
     
     # Set up database
@@ -3,9 +3,14 @@ Exploratory Data Analysis Module for Vaccination Data Analysis Project
 This module performs comprehensive EDA on vaccination datasets.
 """
 
+import os
+import sqlite3
+import pickle
+import hashlib
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
@@ -17,45 +22,304 @@ warnings.filterwarnings('ignore')
 plt.style.use('default')
 sns.set_palette("husl")
 
+# Columns each analysis reads from the cleaned datasets; datasets not listed are unused
+EDA_COLUMNS = {
+    'coverage': ['CODE', 'NAME', 'YEAR', 'ANTIGEN', 'COVERAGE'],
+    'incidence': ['CODE', 'YEAR', 'DISEASE', 'INCIDENCE_RATE'],
+    'vaccine_introduction': ['ISO_3_CODE', 'WHO_REGION']
+}
+
+# Mean, median, sample variance, min and max of a fact column per key. SQLite
+# has no MEDIAN or STDEV, so the median is read off the row ranks within each
+# key and the variance is centred on the key's mean
+_GROUPED_STATS_SQL = """
+WITH ranked AS (
+    SELECT {key} AS grp,
+           {value} AS value,
+           AVG({value}) OVER (PARTITION BY {key}) AS grp_mean,
+           ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY {value}) AS rn,
+           COUNT(*) OVER (PARTITION BY {key}) AS n
+    FROM {table}
+    WHERE {value} IS NOT NULL
+)
+SELECT grp AS {alias},
+       AVG(value) AS mean,
+       AVG(CASE WHEN rn IN ((n + 1) / 2, (n + 2) / 2) THEN value END) AS median,
+       SUM((value - grp_mean) * (value - grp_mean)) / (COUNT(*) - 1) AS var,
+       MIN(value) AS min,
+       MAX(value) AS max
+FROM ranked
+GROUP BY grp
+ORDER BY grp
+"""
+
+def _insights_cache_file(source_files, cache_path):
+    """
+    Return the cache file for insights computed from the given source files.
+    
+    The key covers each file's path, modification time and size, plus this
+    module itself so a change to the analyses also invalidates the cache.
+    
+    Returns:
+        str: Pickle path under cache_path, or None if a source file is missing
+    """
+    try:
+        key = ":".join(
+            f"{os.path.abspath(path)}:{os.path.getmtime(path)}:{os.path.getsize(path)}"
+            for path in sorted([*source_files, __file__])
+        )
+    except OSError:
+        return None
+    return f"{cache_path}/{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}.pkl"
+
+def _mean_of_sums(sums, name):
+    """Return the means of a frame of per-group 'sum' and 'count' columns as a named Series."""
+    return (sums['sum'] / sums['count']).rename(name)
+
 class VaccinationEDA:
     """Class to perform exploratory data analysis on vaccination datasets."""
     
-    def __init__(self, cleaned_datasets):
+    def __init__(self, cleaned_datasets, db_path=None, source_files=None, cache_path="./cache/eda"):
         """
         Initialize EDA with cleaned datasets.
         
         Args:
             cleaned_datasets (dict): Dictionary of cleaned datasets
+            db_path (str): Vaccination database to aggregate in SQL instead
+                (see from_sqlite)
+            source_files (list): Files the inputs were read from; when given,
+                run_complete_analysis caches the insights keyed by them
+            cache_path (str): Directory for cached insights
         """
         self.datasets = cleaned_datasets
+        self.db_path = db_path
+        self.source_files = source_files
+        self.cache_path = cache_path
         self.insights = {}
+    
+    @classmethod
+    def from_sqlite(cls, db_path="vaccination_database.db"):
+        """
+        Create an EDA that runs its aggregations in the vaccination database.
+        
+        Each analysis issues grouped SQL against the fact tables and reads back
+        only the summary rows, instead of grouping the full cleaned datasets
+        in pandas.
+        
+        Args:
+            db_path (str): Path to the SQLite database built by database_setup
+            
+        Returns:
+            VaccinationEDA: EDA instance without in-memory datasets
+        """
+        return cls({}, db_path=db_path, source_files=[db_path])
+    
+    def _query(self, query, params=()):
+        """Run an aggregate query against the database and return its result."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return pd.read_sql_query(query, conn, params=params)
+        finally:
+            conn.close()
+    
+    def _grouped_stats(self, table, key, value, alias):
+        """
+        Mean, median, std, min and max of a fact column per key, computed in SQLite.
+        
+        Args:
+            table (str): Fact table
+            key (str): Grouping column
+            value (str): Aggregated column
+            alias (str): Name of the key column in the result
+            
+        Returns:
+            pd.DataFrame: One row per key, ordered by key
+        """
+        stats = self._query(_GROUPED_STATS_SQL.format(table=table, key=key, value=value, alias=alias))
+        stats['std'] = np.sqrt(stats.pop('var'))
+        return stats
+    
+    def _coverage_trends_from_sqlite(self):
+        """Coverage trend summaries aggregated in the database (see analyze_coverage_trends)."""
+        yearly_coverage = self._grouped_stats('fact_vaccination_coverage', 'year', 'coverage', 'YEAR')
+        
+        antigen_trends = self._query("""
+            SELECT year AS YEAR, antigen_code AS ANTIGEN, AVG(coverage) AS COVERAGE
+            FROM fact_vaccination_coverage
+            GROUP BY year, antigen_code
+            ORDER BY year, antigen_code
+        """)
+        
+        top_antigens = self._query("""
+            SELECT antigen_code AS ANTIGEN, AVG(coverage) AS COVERAGE
+            FROM fact_vaccination_coverage
+            GROUP BY antigen_code
+            ORDER BY COVERAGE DESC
+            LIMIT 10
+        """).set_index('ANTIGEN')['COVERAGE']
+        
+        regional_coverage = self._query("""
+            SELECT c.who_region AS WHO_REGION, f.year AS YEAR, AVG(f.coverage) AS COVERAGE
+            FROM fact_vaccination_coverage f
+            JOIN dim_countries c ON c.country_code = f.country_code
+            WHERE c.who_region IS NOT NULL
+            GROUP BY c.who_region, f.year
+            ORDER BY c.who_region, f.year
+        """)
+        
+        return {
+            'yearly_trends': yearly_coverage[['YEAR', 'mean', 'median', 'std']],
+            'antigen_trends': antigen_trends,
+            'top_antigens': top_antigens,
+            'regional_trends': regional_coverage
+        }
+    
+    def _incidence_patterns_from_sqlite(self):
+        """Disease incidence summaries aggregated in the database (see analyze_disease_incidence)."""
+        yearly_incidence = self._grouped_stats('fact_disease_incidence', 'year', 'incidence_rate', 'YEAR')
+        
+        disease_trends = self._query("""
+            SELECT year AS YEAR, disease_code AS DISEASE, AVG(incidence_rate) AS INCIDENCE_RATE
+            FROM fact_disease_incidence
+            GROUP BY year, disease_code
+            ORDER BY year, disease_code
+        """)
+        
+        top_diseases = self._query("""
+            SELECT disease_code AS DISEASE, AVG(incidence_rate) AS INCIDENCE_RATE
+            FROM fact_disease_incidence
+            GROUP BY disease_code
+            ORDER BY INCIDENCE_RATE DESC
+            LIMIT 10
+        """).set_index('DISEASE')['INCIDENCE_RATE']
+        
+        return {
+            'yearly_trends': yearly_incidence[['YEAR', 'mean', 'median', 'std']],
+            'disease_trends': disease_trends,
+            'top_diseases': top_diseases
+        }
+    
+    def _pair_means_from_sqlite(self, antigen_disease_mapping):
+        """
+        Country-year coverage and incidence means for each antigen/disease pair, joined in the database.
+        
+        Args:
+            antigen_disease_mapping (dict): Disease code for each antigen code
+            
+        Returns:
+            pd.DataFrame: ANTIGEN, DISEASE, COVERAGE and INCIDENCE_RATE per pair, country and year
+        """
+        pair_values = ", ".join(["(?, ?)"] * len(antigen_disease_mapping))
+        params = [code for pair in antigen_disease_mapping.items() for code in pair]
+        return self._query(f"""
+            WITH pairs(antigen_code, disease_code) AS (VALUES {pair_values}),
+            antigen_coverage AS (
+                SELECT antigen_code, country_code, year, AVG(coverage) AS coverage
+                FROM fact_vaccination_coverage
+                WHERE antigen_code IN (SELECT antigen_code FROM pairs)
+                GROUP BY antigen_code, country_code, year
+            ),
+            disease_incidence AS (
+                SELECT disease_code, country_code, year, AVG(incidence_rate) AS incidence_rate
+                FROM fact_disease_incidence
+                WHERE disease_code IN (SELECT disease_code FROM pairs)
+                GROUP BY disease_code, country_code, year
+            )
+            SELECT p.antigen_code AS ANTIGEN, p.disease_code AS DISEASE,
+                   ac.coverage AS COVERAGE, di.incidence_rate AS INCIDENCE_RATE
+            FROM pairs p
+            JOIN antigen_coverage ac ON ac.antigen_code = p.antigen_code
+            JOIN disease_incidence di ON di.disease_code = p.disease_code
+                AND di.country_code = ac.country_code
+                AND di.year = ac.year
+        """, params)
+    
+    def _vaccination_gaps_from_sqlite(self):
+        """Coverage gap summaries aggregated in the database (see analyze_vaccination_gaps)."""
+        lowest_coverage = self._query("""
+            SELECT f.country_code AS CODE, c.country_name AS NAME, AVG(f.coverage) AS COVERAGE
+            FROM fact_vaccination_coverage f
+            JOIN dim_countries c ON c.country_code = f.country_code
+            WHERE f.year >= (SELECT MAX(year) FROM fact_vaccination_coverage) - 2
+            GROUP BY f.country_code, c.country_name
+            ORDER BY COVERAGE
+            LIMIT 20
+        """)
+        
+        antigen_gaps = self._grouped_stats('fact_vaccination_coverage', 'antigen_code', 'coverage', 'ANTIGEN')
+        antigen_gaps = antigen_gaps[['ANTIGEN', 'mean', 'std', 'min', 'max']]
+        antigen_gaps['gap'] = antigen_gaps['max'] - antigen_gaps['min']
+        largest_gaps = antigen_gaps.sort_values('gap', ascending=False).head(10)
         
+        # Mean yearly change per country from its first and last yearly means
+        # (see analyze_vaccination_gaps)
+        coverage_changes = self._query("""
+            WITH country_yearly AS (
+                SELECT country_code, year, AVG(coverage) AS coverage
+                FROM fact_vaccination_coverage
+                GROUP BY country_code, year
+            ),
+            country_span AS (
+                SELECT country_code, MIN(year) AS first_year, MAX(year) AS last_year, COUNT(*) AS years
+                FROM country_yearly
+                GROUP BY country_code
+                HAVING COUNT(*) > 1
+            )
+            SELECT s.country_code AS country,
+                   (ly.coverage - fy.coverage) / (s.years - 1) AS avg_yearly_change
+            FROM country_span s
+            JOIN country_yearly fy ON fy.country_code = s.country_code AND fy.year = s.first_year
+            JOIN country_yearly ly ON ly.country_code = s.country_code AND ly.year = s.last_year
+            ORDER BY avg_yearly_change
+        """)
+        
+        return {
+            'lowest_coverage_countries': lowest_coverage,
+            'largest_antigen_gaps': largest_gaps,
+            'coverage_changes': coverage_changes
+        }
+    
     def analyze_coverage_trends(self):
         """Analyze vaccination coverage trends over time."""
         print("Analyzing vaccination coverage trends...")
         
+        if self.db_path is not None:
+            self.insights['coverage_trends'] = self._coverage_trends_from_sqlite()
+            return self.insights['coverage_trends']
+        
         coverage_df = self.datasets['coverage']
         
         # Overall coverage trends by year
         yearly_coverage = coverage_df.groupby('YEAR')['COVERAGE'].agg(['mean', 'median', 'std']).reset_index()
         
+        # One pass over the coverage rows: sums and counts per year, antigen and
+        # country, from which the antigen and regional means are re-aggregated
+        coverage_sums = coverage_df.groupby(['YEAR', 'ANTIGEN', 'CODE'], observed=True, sort=False)['COVERAGE'].agg(['sum', 'count'])
+        
         # Coverage by antigen over time
-        antigen_trends = coverage_df.groupby(['YEAR', 'ANTIGEN'])['COVERAGE'].mean().reset_index()
+        antigen_trends = _mean_of_sums(
+            coverage_sums.groupby(level=['YEAR', 'ANTIGEN'], observed=True).sum(), 'COVERAGE'
+        ).reset_index()
         
         # Top antigens by coverage
-        top_antigens = coverage_df.groupby('ANTIGEN')['COVERAGE'].mean().sort_values(ascending=False).head(10)
+        top_antigens = _mean_of_sums(
+            coverage_sums.groupby(level='ANTIGEN', observed=True, sort=False).sum(), 'COVERAGE'
+        ).sort_values(ascending=False).head(10)
         
         # Regional analysis (using WHO regions from vaccine introduction data if available)
         if 'vaccine_introduction' in self.datasets:
-            # Merge with WHO region data
-            intro_df = self.datasets['vaccine_introduction'][['ISO_3_CODE', 'WHO_REGION']].drop_duplicates()
-            coverage_with_region = coverage_df.merge(
-                intro_df, 
-                left_on='CODE', 
-                right_on='ISO_3_CODE', 
-                how='left'
+            # Look up each country's WHO region (one per country) for the
+            # per-country sums, not every coverage row; mapping the categorical
+            # CODE level only maps its categories
+            region_map = (
+                self.datasets['vaccine_introduction'].drop_duplicates('ISO_3_CODE')
+                .set_index('ISO_3_CODE')['WHO_REGION']
             )
-            regional_coverage = coverage_with_region.groupby(['WHO_REGION', 'YEAR'])['COVERAGE'].mean().reset_index()
+            country_sums = coverage_sums.groupby(level=['CODE', 'YEAR'], observed=True, sort=False).sum()
+            country_sums['WHO_REGION'] = country_sums.index.get_level_values('CODE').map(region_map)
+            regional_coverage = _mean_of_sums(
+                country_sums.groupby(['WHO_REGION', 'YEAR'], observed=True)[['sum', 'count']].sum(), 'COVERAGE'
+            ).reset_index()
         else:
             regional_coverage = None
         
@@ -72,16 +336,26 @@ class VaccinationEDA:
         """Analyze disease incidence patterns."""
         print("Analyzing disease incidence patterns...")
         
+        if self.db_path is not None:
+            self.insights['incidence_patterns'] = self._incidence_patterns_from_sqlite()
+            return self.insights['incidence_patterns']
+        
         incidence_df = self.datasets['incidence']
         
         # Overall incidence trends by year
         yearly_incidence = incidence_df.groupby('YEAR')['INCIDENCE_RATE'].agg(['mean', 'median', 'std']).reset_index()
         
+        # One pass over the incidence rows: sums and counts per year and
+        # disease, from which both disease means are re-aggregated
+        incidence_sums = incidence_df.groupby(['YEAR', 'DISEASE'], observed=True)['INCIDENCE_RATE'].agg(['sum', 'count'])
+        
         # Incidence by disease over time
-        disease_trends = incidence_df.groupby(['YEAR', 'DISEASE'])['INCIDENCE_RATE'].mean().reset_index()
+        disease_trends = _mean_of_sums(incidence_sums, 'INCIDENCE_RATE').reset_index()
         
         # Top diseases by incidence rate
-        top_diseases = incidence_df.groupby('DISEASE')['INCIDENCE_RATE'].mean().sort_values(ascending=False).head(10)
+        top_diseases = _mean_of_sums(
+            incidence_sums.groupby(level='DISEASE', observed=True, sort=False).sum(), 'INCIDENCE_RATE'
+        ).sort_values(ascending=False).head(10)
         
         self.insights['incidence_patterns'] = {
             'yearly_trends': yearly_incidence,
@@ -95,9 +369,6 @@ class VaccinationEDA:
         """Analyze relationship between vaccination coverage and disease incidence."""
         print("Analyzing coverage vs incidence correlation...")
         
-        coverage_df = self.datasets['coverage']
-        incidence_df = self.datasets['incidence']
-        
         # Create mapping between antigens and diseases
         antigen_disease_mapping = {
             'DTP1': 'DIPHTHERIA',
@@ -112,30 +383,52 @@ class VaccinationEDA:
             'RCV1': 'RUBELLA'
         }
         
-        correlation_results = []
-        
-        for antigen, disease in antigen_disease_mapping.items():
-            # Get coverage data for specific antigen
-            antigen_coverage = coverage_df[coverage_df['ANTIGEN'] == antigen].groupby(['CODE', 'YEAR'])['COVERAGE'].mean().reset_index()
-            
-            # Get incidence data for corresponding disease
-            disease_incidence = incidence_df[incidence_df['DISEASE'] == disease].groupby(['CODE', 'YEAR'])['INCIDENCE_RATE'].mean().reset_index()
+        if self.db_path is not None:
+            merged_data = self._pair_means_from_sqlite(antigen_disease_mapping)
+        else:
+            coverage_df = self.datasets['coverage']
+            incidence_df = self.datasets['incidence']
             
-            # Merge coverage and incidence data
-            merged_data = antigen_coverage.merge(
-                disease_incidence, 
-                on=['CODE', 'YEAR'], 
-                how='inner'
+            # Tag the coverage means with their target disease and join all pairs
+            # to the incidence means in one merge instead of one per pair
+            pairs = pd.DataFrame(list(antigen_disease_mapping.items()), columns=['ANTIGEN', 'DISEASE'])
+            antigen_coverage = (
+                coverage_df[coverage_df['ANTIGEN'].isin(pairs['ANTIGEN'])]
+                .groupby(['ANTIGEN', 'CODE', 'YEAR'], observed=True, sort=False)['COVERAGE'].mean().reset_index()
             )
-            
-            if len(merged_data) > 10:  # Only analyze if we have enough data points
-                correlation = merged_data['COVERAGE'].corr(merged_data['INCIDENCE_RATE'])
-                correlation_results.append({
-                    'antigen': antigen,
-                    'disease': disease,
-                    'correlation': correlation,
-                    'data_points': len(merged_data)
-                })
+            disease_incidence = (
+                incidence_df[incidence_df['DISEASE'].isin(pairs['DISEASE'])]
+                .groupby(['DISEASE', 'CODE', 'YEAR'], observed=True, sort=False)['INCIDENCE_RATE'].mean().reset_index()
+            )
+            merged_data = antigen_coverage.astype({'ANTIGEN': str}).merge(pairs, on='ANTIGEN', how='inner').merge(
+                disease_incidence.astype({'DISEASE': str}),
+                on=['DISEASE', 'CODE', 'YEAR'],
+                how='inner',
+                validate='many_to_one'
+            )
+        
+        # Row positions of each pair; the correlations run on contiguous
+        # float64 arrays, skipping rows where either value is missing
+        pair_rows = merged_data.groupby(['ANTIGEN', 'DISEASE'], sort=False).indices
+        coverage = merged_data['COVERAGE'].to_numpy(dtype=np.float64)
+        incidence = merged_data['INCIDENCE_RATE'].to_numpy(dtype=np.float64)
+        complete = np.isfinite(coverage) & np.isfinite(incidence)
+        
+        def pair_correlation(rows):
+            rows = rows[complete[rows]]
+            return np.corrcoef(coverage[rows], incidence[rows])[0, 1]
+        
+        # Only analyze pairs with enough data points, in mapping order
+        correlation_results = [
+            {
+                'antigen': antigen,
+                'disease': disease,
+                'correlation': pair_correlation(pair_rows[(antigen, disease)]),
+                'data_points': len(pair_rows[(antigen, disease)])
+            }
+            for antigen, disease in antigen_disease_mapping.items()
+            if len(pair_rows.get((antigen, disease), ())) > 10
+        ]
         
         self.insights['coverage_incidence_correlation'] = correlation_results
         return correlation_results
@@ -144,33 +437,36 @@ class VaccinationEDA:
         """Identify vaccination coverage gaps and disparities."""
         print("Analyzing vaccination gaps and disparities...")
         
+        if self.db_path is not None:
+            self.insights['vaccination_gaps'] = self._vaccination_gaps_from_sqlite()
+            return self.insights['vaccination_gaps']
+        
         coverage_df = self.datasets['coverage']
         
         # Countries with lowest coverage rates
         latest_year = coverage_df['YEAR'].max()
         recent_coverage = coverage_df[coverage_df['YEAR'] >= latest_year - 2]
         
-        country_coverage = recent_coverage.groupby(['CODE', 'NAME'])['COVERAGE'].mean().reset_index()
+        country_coverage = recent_coverage.groupby(['CODE', 'NAME'], observed=True, sort=False)['COVERAGE'].mean().reset_index()
         lowest_coverage = country_coverage.sort_values('COVERAGE').head(20)
         
         # Antigens with largest coverage gaps
-        antigen_gaps = coverage_df.groupby('ANTIGEN')['COVERAGE'].agg(['mean', 'std', 'min', 'max']).reset_index()
+        antigen_gaps = coverage_df.groupby('ANTIGEN', observed=True, sort=False)['COVERAGE'].agg(['mean', 'std', 'min', 'max']).reset_index()
         antigen_gaps['gap'] = antigen_gaps['max'] - antigen_gaps['min']
         largest_gaps = antigen_gaps.sort_values('gap', ascending=False).head(10)
         
-        # Year-over-year coverage changes
-        yearly_changes = []
-        for country in coverage_df['CODE'].unique()[:50]:  # Analyze top 50 countries
-            country_data = coverage_df[coverage_df['CODE'] == country].groupby('YEAR')['COVERAGE'].mean().reset_index()
-            if len(country_data) > 1:
-                country_data['change'] = country_data['COVERAGE'].diff()
-                avg_change = country_data['change'].mean()
-                yearly_changes.append({
-                    'country': country,
-                    'avg_yearly_change': avg_change
-                })
-        
-        coverage_changes = pd.DataFrame(yearly_changes).sort_values('avg_yearly_change')
+        # Average year-over-year coverage change for every country. The yearly
+        # changes telescope, so their mean is (last - first) / (years - 1) and
+        # needs no per-row diff; countries with a single year have no change
+        country_yearly = coverage_df.groupby(['CODE', 'YEAR'], observed=True)['COVERAGE'].mean()
+        country_span = country_yearly.groupby(level='CODE', observed=True, sort=False).agg(['first', 'last', 'count'])
+        avg_yearly_change = (country_span['last'] - country_span['first']) / (country_span['count'] - 1)
+        coverage_changes = (
+            avg_yearly_change[country_span['count'] > 1]
+            .rename_axis('country')
+            .reset_index(name='avg_yearly_change')
+            .sort_values('avg_yearly_change')
+        )
         
         self.insights['vaccination_gaps'] = {
             'lowest_coverage_countries': lowest_coverage,
@@ -184,34 +480,37 @@ class VaccinationEDA:
         """Create comprehensive visualizations."""
         print("Creating visualizations...")
         
-        import os
         os.makedirs(save_path, exist_ok=True)
         
         # 1. Vaccination Coverage Trends Over Time
         if 'coverage_trends' in self.insights:
-            fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+            # A standalone Figure renders straight to the Agg canvas, without
+            # pyplot's GUI backend or figure registry; the plotted columns are
+            # handed over as NumPy arrays
+            fig = Figure(figsize=(15, 12), layout='tight')
+            axes = fig.subplots(2, 2)
             
             # Overall coverage trend
             yearly_data = self.insights['coverage_trends']['yearly_trends']
-            axes[0, 0].plot(yearly_data['YEAR'], yearly_data['mean'], marker='o')
-            axes[0, 0].fill_between(yearly_data['YEAR'], 
-                                  yearly_data['mean'] - yearly_data['std'], 
-                                  yearly_data['mean'] + yearly_data['std'], 
-                                  alpha=0.3)
+            years = yearly_data['YEAR'].to_numpy()
+            mean = yearly_data['mean'].to_numpy()
+            std = yearly_data['std'].to_numpy()
+            axes[0, 0].plot(years, mean, marker='o')
+            axes[0, 0].fill_between(years, mean - std, mean + std, alpha=0.3)
             axes[0, 0].set_title('Overall Vaccination Coverage Trends')
             axes[0, 0].set_xlabel('Year')
             axes[0, 0].set_ylabel('Coverage (%)')
             
             # Top antigens coverage
-            top_antigens = self.insights['coverage_trends']['top_antigens']
-            axes[0, 1].barh(top_antigens.index[:10], top_antigens.values[:10])
+            top_antigens = self.insights['coverage_trends']['top_antigens'].head(10)
+            axes[0, 1].barh(top_antigens.index.astype(str).to_numpy(), top_antigens.to_numpy())
             axes[0, 1].set_title('Top 10 Antigens by Average Coverage')
             axes[0, 1].set_xlabel('Average Coverage (%)')
             
             # Disease incidence trends if available
             if 'incidence_patterns' in self.insights:
                 incidence_data = self.insights['incidence_patterns']['yearly_trends']
-                axes[1, 0].plot(incidence_data['YEAR'], incidence_data['mean'], marker='s', color='red')
+                axes[1, 0].plot(incidence_data['YEAR'].to_numpy(), incidence_data['mean'].to_numpy(), marker='s', color='red')
                 axes[1, 0].set_title('Disease Incidence Trends')
                 axes[1, 0].set_xlabel('Year')
                 axes[1, 0].set_ylabel('Incidence Rate')
@@ -219,15 +518,13 @@ class VaccinationEDA:
             # Coverage gaps
             if 'vaccination_gaps' in self.insights:
                 gaps_data = self.insights['vaccination_gaps']['largest_antigen_gaps']
-                axes[1, 1].bar(range(len(gaps_data)), gaps_data['gap'])
+                axes[1, 1].bar(np.arange(len(gaps_data)), gaps_data['gap'].to_numpy())
                 axes[1, 1].set_title('Vaccination Coverage Gaps by Antigen')
                 axes[1, 1].set_xlabel('Antigen')
                 axes[1, 1].set_ylabel('Coverage Gap (%)')
                 axes[1, 1].tick_params(axis='x', rotation=45)
             
-            plt.tight_layout()
-            plt.savefig(f"{save_path}/vaccination_analysis_overview.png", dpi=300, bbox_inches='tight')
-            plt.close()
+            fig.savefig(f"{save_path}/vaccination_analysis_overview.png", dpi=120)
         
         # 2. Interactive Plotly Visualizations
         if 'coverage_trends' in self.insights and self.insights['coverage_trends']['regional_trends'] is not None:
@@ -235,20 +532,24 @@ class VaccinationEDA:
             
             fig = px.line(regional_data, x='YEAR', y='COVERAGE', color='WHO_REGION',
                          title='Vaccination Coverage by WHO Region Over Time')
-            fig.write_html(f"{save_path}/regional_coverage_trends.html")
+            # Link a shared plotly.min.js in the same directory instead of
+            # embedding the full library in the HTML file
+            fig.write_html(f"{save_path}/regional_coverage_trends.html", include_plotlyjs='directory')
         
         # 3. Correlation Heatmap
         if 'coverage_incidence_correlation' in self.insights:
-            corr_data = pd.DataFrame(self.insights['coverage_incidence_correlation'])
-            if not corr_data.empty:
-                plt.figure(figsize=(10, 6))
-                plt.barh(corr_data['antigen'] + ' vs ' + corr_data['disease'], corr_data['correlation'])
-                plt.title('Correlation between Vaccination Coverage and Disease Incidence')
-                plt.xlabel('Correlation Coefficient')
-                plt.axvline(x=0, color='black', linestyle='-', alpha=0.3)
-                plt.tight_layout()
-                plt.savefig(f"{save_path}/coverage_incidence_correlation.png", dpi=300, bbox_inches='tight')
-                plt.close()
+            # At most one bar per mapped pair, so the labels and values are
+            # read straight off the result list rather than via a DataFrame
+            corr_data = self.insights['coverage_incidence_correlation']
+            if corr_data:
+                labels = [f"{result['antigen']} vs {result['disease']}" for result in corr_data]
+                fig = Figure(figsize=(10, 6), layout='tight')
+                ax = fig.subplots()
+                ax.barh(labels, [result['correlation'] for result in corr_data])
+                ax.set_title('Correlation between Vaccination Coverage and Disease Incidence')
+                ax.set_xlabel('Correlation Coefficient')
+                ax.axvline(x=0, color='black', linestyle='-', alpha=0.3)
+                fig.savefig(f"{save_path}/coverage_incidence_correlation.png", dpi=120)
         
         print(f"Visualizations saved to {save_path}")
     
@@ -294,10 +595,28 @@ class VaccinationEDA:
         """Run complete EDA analysis."""
         print("Starting comprehensive EDA...")
         
-        self.analyze_coverage_trends()
-        self.analyze_disease_incidence()
-        self.analyze_coverage_vs_incidence()
-        self.analyze_vaccination_gaps()
+        # The analyses are pure functions of the inputs, so unchanged source
+        # files reuse the insights of an earlier run
+        cache_file = _insights_cache_file(self.source_files, self.cache_path) if self.source_files else None
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file, "rb") as f:
+                self.insights = pickle.load(f)
+            print(f"Loaded cached insights from {cache_file}")
+        else:
+            self.analyze_coverage_trends()
+            self.analyze_disease_incidence()
+            self.analyze_coverage_vs_incidence()
+            self.analyze_vaccination_gaps()
+            if cache_file:
+                try:
+                    os.makedirs(self.cache_path, exist_ok=True)
+                    tmp_file = f"{cache_file}.tmp"
+                    with open(tmp_file, "wb") as f:
+                        pickle.dump(self.insights, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(tmp_file, cache_file)
+                except Exception as e:
+                    print(f"Could not cache insights: {e}")
+        
         self.create_visualizations()
         
         # Generate and save insights report
@@ -312,23 +631,21 @@ class VaccinationEDA:
         return self.insights
 
 if __name__ == "__main__":
-    # Load cleaned datasets
-    import os
-    
-    cleaned_datasets = {}
-    data_files = {
-        'coverage': './cleaned_data/coverage_cleaned.csv',
-        'incidence': './cleaned_data/incidence_cleaned.csv',
-        'reported_cases': './cleaned_data/reported_cases_cleaned.csv',
-        'vaccine_introduction': './cleaned_data/vaccine_introduction_cleaned.csv',
-        'vaccine_schedule': './cleaned_data/vaccine_schedule_cleaned.csv'
-    }
-    
-    for name, file_path in data_files.items():
-        if os.path.exists(file_path):
-            cleaned_datasets[name] = pd.read_csv(file_path)
-            print(f"Loaded {name} dataset: {cleaned_datasets[name].shape}")
+    if os.path.exists('./vaccination_database.db'):
+        # Aggregate in the database and read back only the summaries
+        eda = VaccinationEDA.from_sqlite('./vaccination_database.db')
+    else:
+        # Load cleaned datasets, reading only the columns the analyses use so
+        # the Parquet reader skips the rest
+        cleaned_datasets = {}
+        source_files = []
+        for name, columns in EDA_COLUMNS.items():
+            file_path = f'./cleaned_data/{name}_cleaned.parquet'
+            if os.path.exists(file_path):
+                cleaned_datasets[name] = pd.read_parquet(file_path, engine='pyarrow', columns=columns)
+                source_files.append(file_path)
+                print(f"Loaded {name} dataset: {cleaned_datasets[name].shape}")
+        eda = VaccinationEDA(cleaned_datasets, source_files=source_files)
     
     # Run EDA
-    eda = VaccinationEDA(cleaned_datasets)
     insights = eda.run_complete_analysis()
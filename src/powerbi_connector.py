@@ -4,8 +4,127 @@ Power BI Connection Guide for Vaccination Data Analysis Project
 This script provides guidance and sample code for connecting Power BI to the vaccination database.
 """
 
+import os
 import sqlite3
-import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+try:
+    from src.sqlite_tuning import apply_read_pragmas
+except ImportError:
+    # Run as a script from src/
+    from sqlite_tuning import apply_read_pragmas
+
+# Rows fetched from SQLite per batch while streaming an export to disk
+EXPORT_CHUNK_ROWS = 200_000
+
+# Arrow type for a column given the SQLite storage classes found in it
+_STORAGE_CLASS_TYPES = (
+    ('text', pa.string()),
+    ('blob', pa.binary()),
+    ('real', pa.float64()),
+    ('integer', pa.int64()),
+)
+
+def _export_schema(conn, query):
+    """
+    Derive the Arrow schema of an export query from every row it returns.
+    
+    SQLite types each value rather than each column, so one pass over the
+    query collects the storage classes (typeof) seen in every column. A
+    column gets the widest type it holds: integers become float64 when any
+    value is real, and a column that is NULL throughout becomes the null type.
+    A column mixing text or blobs with other values has no single type that
+    keeps them intact, so it is rejected.
+    
+    Args:
+        conn (sqlite3.Connection): Open database connection
+        query (str): Export query
+        
+    Returns:
+        pa.Schema: Schema covering the whole result
+        
+    Raises:
+        ValueError: If a column mixes text or blobs with other storage classes
+    """
+    names = [column[0] for column in conn.execute(f"SELECT * FROM ({query}) LIMIT 0").description]
+    quoted = ['"{}"'.format(name.replace('"', '""')) for name in names]
+    storage_classes = conn.execute(
+        f"SELECT {', '.join(f'group_concat(DISTINCT typeof({name}))' for name in quoted)} FROM ({query})"
+    ).fetchone()
+    fields = []
+    for name, found in zip(names, storage_classes):
+        found = set((found or '').split(',')) - {'', 'null'}
+        # Numbers in a text column would be silently turned into strings
+        if len(found - {'integer', 'real'}) + bool(found & {'integer', 'real'}) > 1:
+            raise ValueError(f"Column {name} mixes SQLite storage classes {sorted(found)}")
+        arrow_type = next((t for storage_class, t in _STORAGE_CLASS_TYPES if storage_class in found), pa.null())
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+def _export_query(db_path, query, file_path, write_csv=False, chunksize=EXPORT_CHUNK_ROWS):
+    """
+    Stream one export query to Parquet, and optionally CSV (module level so it can run in a worker process).
+    
+    The result is fetched in chunks and appended to writers opened once, so
+    the full result is never held in memory. Each chunk of row tuples is
+    turned straight into Arrow columns, without building a DataFrame. The
+    files are written under temporary names and only replace the previous
+    export once complete, so a failed export never leaves a truncated file.
+    
+    Args:
+        db_path (str): SQLite database path
+        query (str): Export query
+        file_path (str): Output path without extension
+        write_csv (bool): Also write a CSV copy
+        chunksize (int): Rows per fetched chunk
+        
+    Returns:
+        int: Number of exported records
+    """
+    conn = sqlite3.connect(db_path)
+    apply_read_pragmas(conn)
+    outputs = [f"{file_path}.parquet"] + ([f"{file_path}.csv"] if write_csv else [])
+    writers = []
+    records = 0
+    try:
+        # One read transaction, so the rows exported are the ones the schema
+        # was derived from even if the database is written in between
+        conn.execute("BEGIN")
+        schema = _export_schema(conn, query)
+        # Snappy is the codec every Power BI Parquet reader handles
+        writers.append(pq.ParquetWriter(f"{outputs[0]}.tmp", schema, compression='snappy'))
+        if write_csv:
+            writers.append(pa_csv.CSVWriter(f"{outputs[1]}.tmp", schema))
+        
+        cursor = conn.execute(query)
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            # Safe casts: a value the schema type cannot hold exactly (e.g. 2.5
+            # in an integer column) raises instead of being truncated
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(column).cast(field.type) for column, field in zip(zip(*rows), schema)], schema=schema
+            )
+            for writer in writers:
+                writer.write_batch(batch)
+            records += len(rows)
+        
+        for writer in writers:
+            writer.close()
+        writers = []
+        for output in outputs:
+            os.replace(f"{output}.tmp", output)
+    finally:
+        for writer in writers:
+            writer.close()
+        for output in outputs:
+            if os.path.exists(f"{output}.tmp"):
+                os.remove(f"{output}.tmp")
+        conn.close()
+    return records
 
 class PowerBIConnector:
     """Helper class for Power BI database connections."""
@@ -104,24 +223,39 @@ class PowerBIConnector:
         }
         return queries
     
-    def export_powerbi_datasets(self, output_path="./powerbi_data"):
-        """Export datasets for Power BI import."""
-        import os
+    def export_powerbi_datasets(self, output_path="./powerbi_data", max_workers=None, write_csv=False):
+        """
+        Export datasets for Power BI import as Parquet files.
+        
+        Each query reads the database through its own connection, so the
+        exports run side by side in worker processes.
+        
+        Args:
+            output_path (str): Directory for the exported files
+            max_workers (int): Number of worker processes (defaults to one per query,
+                capped at the CPU count)
+            write_csv (bool): Also write CSV copies
+        """
         os.makedirs(output_path, exist_ok=True)
         
-        conn = sqlite3.connect(self.db_path)
         queries = self.create_powerbi_queries()
+        if max_workers is None:
+            max_workers = min(len(queries), os.cpu_count() or 1)
         
-        for name, query in queries.items():
-            try:
-                df = pd.read_sql_query(query, conn)
-                file_path = f"{output_path}/{name}.csv"
-                df.to_csv(file_path, index=False)
-                print(f"Exported {name}: {len(df)} records to {file_path}")
-            except Exception as e:
-                print(f"Error exporting {name}: {e}")
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                name: executor.submit(_export_query, self.db_path, query, f"{output_path}/{name}", write_csv)
+                for name, query in queries.items()
+            }
+            for name, future in futures.items():
+                try:
+                    records = future.result()
+                    print(f"Exported {name}: {records} records to {output_path}/{name}.parquet")
+                except Exception as e:
+                    # A missing export must fail the step rather than look up to date
+                    print(f"Error exporting {name}: {e}")
+                    raise
         
-        conn.close()
         print(f"\nAll datasets exported to {output_path}")
     
     def generate_powerbi_guide(self):
@@ -137,15 +271,15 @@ class PowerBIConnector:
 3. Browse to: vaccination_database.db
 4. Select tables and views to import
 
-### Option 2: CSV Import (Recommended for easier deployment)
-1. Use the exported CSV files from the powerbi_data folder
-2. In Power BI: "Get Data" > "Text/CSV"
+### Option 2: Parquet Import (Recommended for easier deployment)
+1. Use the exported Parquet files from the powerbi_data folder
+2. In Power BI: "Get Data" > "Parquet"
 3. Import the following files:
-   - coverage_summary.csv
-   - disease_burden_summary.csv
-   - vaccination_effectiveness.csv
-   - kpi_metrics.csv
-   - regional_trends.csv
+   - coverage_summary.parquet
+   - disease_burden_summary.parquet
+   - vaccination_effectiveness.parquet
+   - kpi_metrics.parquet
+   - regional_trends.parquet
 
 ## Data Model Setup
 
@@ -260,6 +394,25 @@ Set up automatic data refresh if using direct database connection:
 """
         
         return guide
+    
+    def save_powerbi_guide(self, file_path="./powerbi_data/PowerBI_Setup_Guide.md"):
+        """
+        Write the Power BI setup guide to disk atomically.
+        
+        The guide is written to a temporary file that replaces the target
+        only once it is fully on disk, so an interrupted run never leaves a
+        truncated guide behind.
+        
+        Args:
+            file_path (str): Destination path of the guide
+        """
+        guide = self.generate_powerbi_guide()
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(guide)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
 
 def main():
     """Generate Power BI connection materials."""
@@ -271,9 +424,7 @@ def main():
     connector.export_powerbi_datasets()
     
     # Generate connection guide
-    guide = connector.generate_powerbi_guide()
-    with open("./powerbi_data/PowerBI_Setup_Guide.md", "w") as f:
-        f.write(guide)
+    connector.save_powerbi_guide()
     
     # Save connection info
     info = connector.get_connection_info()
@@ -284,7 +435,7 @@ def main():
             f.write(f"{key}: {value}\n")
     
     print("\nPower BI materials generated:")
-    print("• ./powerbi_data/ - Exported CSV datasets")
+    print("• ./powerbi_data/ - Exported Parquet datasets")
     print("• ./powerbi_data/PowerBI_Setup_Guide.md - Setup instructions")
     print("• ./powerbi_data/connection_info.txt - Connection details")
 
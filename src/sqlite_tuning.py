@@ -0,0 +1,18 @@
+"""
+SQLite Tuning Module for Vaccination Data Analysis Project
+This module holds the connection settings shared by the modules that read the database.
+"""
+
+def apply_read_pragmas(conn):
+    """
+    Tune a sqlite3 connection for the read-only analysis and export queries.
+    
+    Hot pages stay in a 200MB page cache, the file is memory-mapped, and
+    GROUP BY/ORDER BY sorts run in memory instead of temporary files.
+    
+    Args:
+        conn (sqlite3.Connection): Connection to tune
+    """
+    conn.execute("PRAGMA cache_size=-200000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")